@@ -0,0 +1,48 @@
+# aggregations.py
+"""Shared aggregation plan for the figure scripts.
+
+All figures are built from counts over a handful of warehouse columns, so the
+warehouse frame is grouped once at the finest grain they need and every chart
+input is rolled up from that (small) result. The warehouse frame itself is
+never modified.
+"""
+import pandas as pd
+
+def calendar_part(df, column):
+    """Year/Month of the calendar dimension, or of FullDate in exports written before it had them."""
+    if column in df.columns:
+        return df[column]
+    dates = pd.to_datetime(df["FullDate"])
+    return getattr(dates.dt, column.lower()).rename(column)
+
+def base_counts(df):
+    """One pass over the warehouse: order counts at the finest grain any figure uses."""
+    keys = [
+        df["Country_x"], df["FirstName"], df["LastName"],
+        calendar_part(df, "Year"), calendar_part(df, "Month").rename("MonthNum"),
+        df["DeliveredFlag"],
+    ]
+    return df.groupby(keys, dropna=False, observed=True).size().reset_index(name="OrderCount")
+
+def ranked(base, by, label):
+    """Order counts per `by`, largest first (like value_counts)."""
+    counts = base.groupby(by, observed=True)["OrderCount"].sum().sort_values(ascending=False, kind="stable")
+    return counts.reset_index().rename(columns={by: label})
+
+def plan_aggregates(df):
+    """Computes every aggregate the static and interactive figures need."""
+    base = base_counts(df)
+
+    employees = base.assign(EmployeeName=base["FirstName"].astype(object) + " " + base["LastName"].astype(object))
+    dated = base.dropna(subset=["Year", "MonthNum"])
+    dated = dated.assign(YearMonth=[f"{int(y):04d}-{int(m):02d}" for y, m in zip(dated["Year"], dated["MonthNum"])])
+
+    return {
+        "delivery_counts": base.groupby("DeliveredFlag")["OrderCount"].sum(),
+        "country_orders": ranked(base, "Country_x", "Country"),
+        "employee_orders": ranked(employees, "EmployeeName", "EmployeeName"),
+        "monthly_orders": dated.groupby("YearMonth")["OrderCount"].sum().reset_index(),
+        "month_country": dated.groupby(["MonthNum", "Country_x"], observed=True)["OrderCount"].sum().reset_index(),
+        "delivery_by_country": base.groupby(["Country_x", "DeliveredFlag"], observed=True)["OrderCount"].sum()
+                                   .reset_index(name="Count"),
+    }
@@ -0,0 +1,88 @@
+# benchmark_extract.py
+"""Memory profile of streaming vs whole-table extraction against a generated SQLite source.
+
+Extracts an "Order Details" table at two sizes, each in a fresh process whose
+peak RSS above its starting RSS is measured. With streaming the peak should
+stay flat while the whole-table read grows with the table; the script exits
+with status 1 when the streaming peak grows with the table size:
+
+    python scripts/benchmark_extract.py [n_rows]   (default 250,000; also runs 4x that)
+
+run_pipeline.py runs it as the extract_memory stage whenever the extraction
+code changes.
+"""
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from data_helpers import export_query
+from metrics import RssSampler
+from settings import EXTRACT_CHUNK_SIZE
+
+MAX_STREAMING_GROWTH = 1.5  # streaming peak at 4x the rows / peak at 1x
+GROWTH_SLACK_MB = 16  # absolute noise allowed on top (allocator, page cache)
+
+def create_order_details_db(path, n_rows, seed=42, batch=200000):
+    """Writes an Access-shaped [Order Details] table into a SQLite file."""
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("DROP TABLE IF EXISTS [Order Details]")
+    for start in range(0, n_rows, batch):
+        n = min(batch, n_rows - start)
+        pd.DataFrame({
+            "ID": np.arange(start + 1, start + n + 1),
+            "Order ID": rng.integers(1, n_rows // 3 + 2, n),
+            "Product ID": rng.integers(1, 100, n),
+            "Quantity": rng.integers(1, 200, n).astype(float),
+            "Unit Price": rng.uniform(1, 100, n).round(2),
+            "Discount": rng.choice([0.0, 0.05, 0.1], n),
+            "Status ID": rng.integers(0, 4, n),
+        }).to_sql("Order Details", conn, if_exists="append", index=False)
+    conn.close()
+
+def profile_extract(db_path, chunk_size, fmt="csv"):
+    """Returns (rows, seconds, peak RSS growth in MB) for one extraction into the storage layer."""
+    conn = sqlite3.connect(db_path)
+    out_dir = os.path.dirname(db_path)
+    sampler = RssSampler(interval=0.01)
+    start = time.perf_counter()
+    out_path, rows = export_query(conn, "SELECT * FROM [Order Details]", out_dir, "Order_Details", chunk_size, fmt=fmt)
+    elapsed = time.perf_counter() - start
+    peak = sampler.stop()
+    conn.close()
+    os.remove(out_path)
+    return rows, elapsed, (peak - sampler.start) / 1024 ** 2
+
+def profile_in_process(db_path, chunk_size):
+    """profile_extract in a freshly spawned interpreter, so earlier runs do not inflate its RSS."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(profile_extract, (db_path, chunk_size))
+
+def run_benchmark(n_rows=250_000, chunk_size=EXTRACT_CHUNK_SIZE):
+    print(f"--- Extraction Memory Profile (chunk size {chunk_size}) ---")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in [n_rows, n_rows * 4]:
+            db_path = os.path.join(tmp, f"source_{size}.db")
+            create_order_details_db(db_path, size)
+            for mode, chunks in [("streaming", chunk_size), ("whole-table", None)]:
+                rows, elapsed, peak_mb = profile_in_process(db_path, chunks)
+                results.append({"rows": rows, "mode": mode, "seconds": round(elapsed, 2), "peak_mb": round(peak_mb, 1)})
+                print(f"{rows:>10,} rows {mode:>11}: {elapsed:7.2f}s  peak {peak_mb:8.1f} MB")
+
+    df = pd.DataFrame(results)
+    streaming = df[df["mode"] == "streaming"]["peak_mb"].to_numpy()
+    flat = streaming[1] <= streaming[0] * MAX_STREAMING_GROWTH + GROWTH_SLACK_MB
+    print(f"Streaming peak grew from {streaming[0]:.1f} MB to {streaming[1]:.1f} MB for a 4x larger table "
+          f"({'flat' if flat else 'NOT flat'}).")
+    return df, flat
+
+if __name__ == "__main__":
+    _, flat = run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 250_000)
+    if not flat:
+        print("[ERROR] Streaming extraction memory grows with the table size.")
+        sys.exit(1)
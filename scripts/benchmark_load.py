@@ -0,0 +1,131 @@
+# benchmark_load.py
+"""Compares rows/sec of the legacy iterrows loader against bulk_insert.
+
+Runs against local stand-ins (SQLite, and DuckDB when installed) using the
+same star schema as SQL Server:
+
+    python scripts/benchmark_load.py [n_orders] [batch_size]
+"""
+import sqlite3
+import sys
+import time
+import numpy as np
+import pandas as pd
+from database_manager import STAR_SCHEMA, LOAD_COLUMNS, bulk_insert
+from warehouse_backend import backend_of
+from date_dimension import build_calendar
+from settings import LOAD_BATCH_SIZE
+
+def make_star_frames(n_orders, seed=42):
+    """Builds synthetic DimCustomer/DimEmployee/DimDate/FactOrders frames."""
+    rng = np.random.default_rng(seed)
+    n_customers, n_employees = 1000, 50
+
+    dim_customers = pd.DataFrame({
+        "CustomerId": np.arange(1, n_customers + 1),
+        "CompanyName": [f"Company {i}" for i in range(1, n_customers + 1)],
+        "City": rng.choice(["Seattle", "Boston", "Paris", "London"], n_customers),
+        "Country": rng.choice(["USA", "France", "UK"], n_customers),
+    })
+    dim_employees = pd.DataFrame({
+        "EmployeeId": np.arange(1, n_employees + 1),
+        "FirstName": [f"First{i}" for i in range(1, n_employees + 1)],
+        "LastName": [f"Last{i}" for i in range(1, n_employees + 1)],
+        "City": "Seattle",
+        "Country": "USA",
+    })
+    dim_date = build_calendar("2006-01-01", "2006-12-31")
+
+    line_count = rng.integers(1, 6, n_orders)
+    quantity = (line_count * rng.integers(1, 30, n_orders)).astype(float)
+    gross = np.round(quantity * rng.uniform(2, 60, n_orders), 2)
+    discount = np.round(gross * rng.choice([0, 0.05, 0.1, 0.15], n_orders), 2)
+    fact_orders = pd.DataFrame({
+        "OrderId": np.arange(1, n_orders + 1),
+        "CustomerId": rng.integers(1, n_customers + 1, n_orders),
+        "EmployeeId": rng.integers(1, n_employees + 1, n_orders),
+        "DateId": rng.choice(dim_date["DateId"].to_numpy(), n_orders),
+        "DeliveredFlag": rng.integers(0, 2, n_orders),
+        "LineCount": line_count,
+        "Quantity": quantity,
+        "GrossAmount": gross,
+        "DiscountAmount": discount,
+        "Revenue": gross - discount,
+        "Cost": np.round(gross * rng.uniform(0.5, 0.8, n_orders), 2),
+    })
+    return dim_customers, dim_employees, dim_date, fact_orders
+
+def create_schema(conn):
+    translate_ddl = backend_of(conn).translate_ddl
+    cur = conn.cursor()
+    for table in reversed(STAR_SCHEMA):
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+    for table, schema in STAR_SCHEMA.items():
+        cur.execute(f"CREATE TABLE {table} ({translate_ddl(schema)})")
+    conn.commit()
+
+def legacy_load(conn, frames):
+    """The original row-by-row load_data body, kept for comparison."""
+    dim_customers, dim_employees, dim_date, fact_orders = frames
+    cur = conn.cursor()
+    for _, r in dim_customers.iterrows():
+        cur.execute("INSERT INTO DimCustomer (CustomerId, CompanyName, City, Country) VALUES (?, ?, ?, ?)",
+                    (int(r["CustomerId"]), r["CompanyName"], r["City"], r["Country"]))
+    for _, r in dim_employees.iterrows():
+        cur.execute("INSERT INTO DimEmployee (EmployeeId, FirstName, LastName, City, Country) VALUES (?, ?, ?, ?, ?)",
+                    (int(r["EmployeeId"]), r["FirstName"], r["LastName"], r["City"], r["Country"]))
+    for _, r in dim_date.iterrows():
+        cur.execute("INSERT INTO DimDate (DateId, FullDate, Day, Month, MonthName) VALUES (?, ?, ?, ?, ?)",
+                    (int(r["DateId"]), r["FullDate"].to_pydatetime(), int(r["Day"]), int(r["Month"]), r["MonthName"]))
+    for _, r in fact_orders.iterrows():
+        cur.execute("INSERT INTO FactOrders (OrderId, CustomerId, EmployeeId, DateId, DeliveredFlag, LineCount, Quantity, "
+                    "GrossAmount, DiscountAmount, Revenue, Cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (int(r["OrderId"]), int(r["CustomerId"]), int(r["EmployeeId"]), int(r["DateId"]), int(r["DeliveredFlag"]),
+                     int(r["LineCount"]), float(r["Quantity"]), float(r["GrossAmount"]), float(r["DiscountAmount"]),
+                     float(r["Revenue"]), float(r["Cost"])))
+    conn.commit()
+
+def bulk_load(conn, frames, batch_size):
+    for table, frame in zip(LOAD_COLUMNS, frames):
+        bulk_insert(conn, table, frame, LOAD_COLUMNS[table], batch_size)
+
+def get_backends():
+    backends = {"sqlite": lambda: sqlite3.connect(":memory:")}
+    try:
+        import duckdb
+        backends["duckdb"] = lambda: duckdb.connect(":memory:")
+    except ImportError:
+        print("[WARN] duckdb not installed, skipping DuckDB stand-in.")
+    return backends
+
+def run_benchmark(n_orders=20000, batch_size=LOAD_BATCH_SIZE):
+    frames = make_star_frames(n_orders)
+    total_rows = sum(len(f) for f in frames)
+    print(f"--- Load Benchmark: {total_rows} rows ({n_orders} orders), batch size {batch_size} ---")
+
+    results = []
+    for backend, connect in get_backends().items():
+        for method in ["iterrows", "bulk"]:
+            conn = connect()
+            create_schema(conn)
+            start = time.perf_counter()
+            if method == "iterrows":
+                legacy_load(conn, frames)
+            else:
+                bulk_load(conn, frames, batch_size)
+            elapsed = time.perf_counter() - start
+            conn.close()
+            results.append({"backend": backend, "method": method, "seconds": round(elapsed, 3),
+                            "rows_per_sec": int(total_rows / elapsed)})
+            print(f"{backend:>7} {method:>9}: {elapsed:8.3f}s  {total_rows / elapsed:12,.0f} rows/sec")
+
+    df = pd.DataFrame(results)
+    base = df[df["method"] == "iterrows"].set_index("backend")["rows_per_sec"]
+    for backend, rate in df[df["method"] == "bulk"].set_index("backend")["rows_per_sec"].items():
+        print(f"{backend}: bulk is {rate / base[backend]:.1f}x faster than iterrows")
+    return df
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else LOAD_BATCH_SIZE
+    run_benchmark(n, batch)
@@ -0,0 +1,254 @@
+# benchmark_pipeline.py
+"""End-to-end pipeline benchmark on synthetic Northwind data.
+
+For each scale a Northwind-shaped source is generated (synthetic_northwind.py)
+into a SQLite stand-in for the Access database, and the pipeline stages run
+against it with an embedded warehouse backend (DuckDB by default, --backend):
+
+    run_etl_pipeline -> load_data -> extract -> transform_and_load_warehouse
+    -> generate_olap_report -> figures
+
+Wall time, orders/sec and peak traced memory (tracemalloc; figure worker
+processes are not included) are recorded per stage and appended to a JSON
+history (BENCHMARK_HISTORY_PATH). Each run is compared with the previous run
+at the same scale and skew:
+
+    python scripts/benchmark_pipeline.py [--orders 10k 1m ...] [--skew 1.1] [--backend sqlite] [--fail-on-regression]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from unittest import mock
+from synthetic_northwind import write_sqlite
+
+SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def parse_orders(text):
+    """'10k' / '2.5M' / '50000' -> order count."""
+    text = text.strip().lower()
+    if text[-1:] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+def rss_high_water_mb():
+    """Process peak RSS so far (Unix only; KB on Linux, bytes on macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+@contextmanager
+def measure(stages, name, orders):
+    """Times one stage and records its throughput and peak traced memory."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    stages.append({
+        "stage": name,
+        "seconds": round(seconds, 3),
+        "orders_per_sec": round(orders / seconds) if seconds else None,
+        "peak_mb": round(peak / 1024 ** 2, 1),
+        "rss_high_water_mb": rss_high_water_mb(),
+    })
+    print(f"[Bench] {name}: {seconds:.2f}s, {peak / 1024 ** 2:.1f} MB peak")
+
+@contextmanager
+def stand_ins(source_path):
+    """Points the Access connection factories at the SQLite stand-in source."""
+    import data_helpers, extract_all, olap_cube
+    from query_cache import QueryCache
+
+    def source(*args, **kwargs):
+        return sqlite3.connect(source_path, check_same_thread=False)
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch.object(data_helpers, "get_access_connection", source))
+        stack.enter_context(mock.patch.object(extract_all, "get_access_conn", source))
+        # Fresh query cache: every scale starts from the same load generation
+        stack.enter_context(mock.patch.object(olap_cube, "query_cache", QueryCache()))
+        yield
+
+def run_scale(n_orders, workdir, skew, seed):
+    """Generates one source and runs every pipeline stage on it; returns stage records."""
+    # Imported here so settings picks up the redirected NORTHWIND_* directories
+    from settings import DATA_DIR, FIGURES_DIR
+    from benchmark_load import create_schema
+    from data_helpers import fetch_from_access
+    from database_manager import load_data, setup_warehouse, connect_warehouse
+    from etl_pipeline import run_etl_pipeline, transform_sources
+    from extract_all import extract_parallel
+    from transform_warehouse import transform_and_load_warehouse
+    from olap_cube import generate_olap_report
+    import generate_figures
+    from aggregations import plan_aggregates
+
+    for directory in [DATA_DIR, FIGURES_DIR]:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+    source_path = os.path.join(workdir, f"source_{n_orders}.db")
+
+    print(f"\n=== {n_orders:,} orders (skew {skew}) ===")
+    stages = []
+    with measure(stages, "generate", n_orders):
+        counts = write_sqlite(source_path, n_orders, seed=seed, skew=skew)
+    print("Source: " + ", ".join(f"{t} {n:,}" for t, n in counts.items()))
+
+    with stand_ins(source_path):
+        setup_warehouse()
+        with measure(stages, "run_etl_pipeline", n_orders):
+            run_etl_pipeline()
+
+        # load_data on its own, from already-transformed frames
+        frames = transform_sources(fetch_from_access("SELECT * FROM Customers"),
+                                   fetch_from_access("SELECT * FROM Employees"),
+                                   fetch_from_access("SELECT * FROM Orders"),
+                                   fetch_from_access("SELECT * FROM [Order Details]"),
+                                   fetch_from_access("SELECT * FROM Products"))
+        conn = connect_warehouse()
+        try:
+            create_schema(conn)
+            with measure(stages, "load_data", n_orders):
+                load_data(*frames, conn=conn)
+        finally:
+            conn.close()
+        del frames
+
+        with measure(stages, "extract", n_orders):
+            extract_parallel()
+        with measure(stages, "transform_and_load_warehouse", n_orders):
+            transform_and_load_warehouse()
+        with measure(stages, "generate_olap_report", n_orders):
+            generate_olap_report()
+        with measure(stages, "figures", n_orders):
+            generate_figures.render_figures(plan_aggregates(generate_figures.load_data()))
+
+    os.remove(source_path)
+    return stages
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_history(path, history):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, path)
+
+def previous_stage(history, orders, skew, backend, stage):
+    """The most recent recorded result of `stage` at the same scale, skew and backend."""
+    for run in reversed(history):
+        # Runs before the backend option used the SQLite stand-in
+        if run.get("skew") != skew or run.get("backend", "sqlite") != backend:
+            continue
+        for result in run["results"]:
+            if result["orders"] == orders:
+                for record in result["stages"]:
+                    if record["stage"] == stage:
+                        return record
+    return None
+
+def compare(run, history, threshold, min_seconds=1.0):
+    """Prints time/memory deltas against the previous run; returns the regressions."""
+    regressions = []
+    for result in run["results"]:
+        print(f"\n{result['orders']:,} orders")
+        print(f"  {'stage':<30} {'seconds':>9} {'orders/s':>11} {'peak MB':>9}   vs previous")
+        for record in result["stages"]:
+            prev = previous_stage(history, result["orders"], run["skew"], run["backend"], record["stage"])
+            note = "(no previous run)"
+            if prev is not None:
+                time_delta = record["seconds"] / prev["seconds"] - 1 if prev["seconds"] else 0.0
+                mem_delta = record["peak_mb"] / prev["peak_mb"] - 1 if prev["peak_mb"] else 0.0
+                note = f"time {time_delta:+.0%}, memory {mem_delta:+.0%}"
+                if time_delta > threshold and record["seconds"] >= min_seconds:
+                    regressions.append(f"{result['orders']:,} orders / {record['stage']}: time {time_delta:+.0%}")
+                    note += "  <-- REGRESSION"
+                if mem_delta > threshold:
+                    regressions.append(f"{result['orders']:,} orders / {record['stage']}: memory {mem_delta:+.0%}")
+                    note += "  <-- REGRESSION"
+            print(f"  {record['stage']:<30} {record['seconds']:>9.2f} {record['orders_per_sec'] or 0:>11,} "
+                  f"{record['peak_mb']:>9.1f}   {note}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark on synthetic Northwind data")
+    parser.add_argument("--orders", nargs="+", default=["10k"], help="scales to run, e.g. 10k 1m 100m")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of customer/product popularity")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backend", choices=["duckdb", "sqlite"], default="duckdb", help="embedded warehouse backend")
+    parser.add_argument("--workdir", help="directory for generated sources and outputs (default: temporary)")
+    parser.add_argument("--history", help="JSON history file (default: BENCHMARK_HISTORY_PATH)")
+    parser.add_argument("--no-record", action="store_true", help="compare only, do not append to the history")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a stage regressed")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="northwind_bench_")
+    # Must be set before settings is first imported
+    os.environ["NORTHWIND_DATA_DIR"] = os.path.join(workdir, "data")
+    os.environ["NORTHWIND_FIGURES_DIR"] = os.path.join(workdir, "figures")
+    os.environ["NORTHWIND_WAREHOUSE_BACKEND"] = args.backend
+    from settings import BENCHMARK_HISTORY_PATH, BENCHMARK_REGRESSION_THRESHOLD
+    history_path = args.history or BENCHMARK_HISTORY_PATH
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "skew": args.skew,
+        "backend": args.backend,
+        "results": [],
+    }
+    try:
+        for orders in map(parse_orders, args.orders):
+            run["results"].append({"orders": orders, "stages": run_scale(orders, workdir, args.skew, args.seed)})
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    history = load_history(history_path)
+    regressions = compare(run, history, BENCHMARK_REGRESSION_THRESHOLD)
+    if not args.no_record:
+        save_history(history_path, history + [run])
+        print(f"\nRecorded run in {history_path}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {BENCHMARK_REGRESSION_THRESHOLD:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
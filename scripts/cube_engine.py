@@ -0,0 +1,277 @@
+# cube_engine.py
+"""Pre-aggregated OLAP cube over the FactOrders star schema.
+
+Every combination of hierarchy levels (Year > Quarter > Month > DateId,
+CustomerCountry > CustomerCity, EmpFirstName) is materialized once as a
+cuboid (the CUBE / GROUPING SETS lattice). Queries are answered from the
+smallest cuboid that covers the requested levels instead of the fact rows.
+Cells hold sums only; averages are computed from them after aggregation.
+Because the sums are additive, orders loaded later are merged into the
+cells (`merge`) instead of rebuilding the lattice.
+"""
+import itertools
+import json
+import os
+import numpy as np
+import pandas as pd
+from settings import CUBE_DIR
+from storage import write_table, read_table, find_table
+
+HIERARCHIES = {
+    "Time": ["Year", "Quarter", "Month", "DateId"],
+    "Geography": ["CustomerCountry", "CustomerCity"],
+    "Employee": ["EmpFirstName"],
+}
+LEVELS = [level for levels in HIERARCHIES.values() for level in levels]
+# Additive measures only, so any cuboid can be re-aggregated from a finer one
+MEASURES = ["OrderCount", "DeliveredCount", "Quantity", "GrossAmount", "DiscountAmount", "Revenue", "Cost"]
+# Fact columns summed as they are (OrderCount/DeliveredCount are derived from the rows)
+VALUE_MEASURES = ["Quantity", "GrossAmount", "DiscountAmount", "Revenue", "Cost"]
+# Averages: (numerator, denominator) sums, divided after aggregation
+RATIOS = {
+    "AvgOrderValue": ("Revenue", "OrderCount"),
+    "AvgQuantity": ("Quantity", "OrderCount"),
+    "AvgUnitPrice": ("GrossAmount", "Quantity"),
+    "AvgDiscount": ("DiscountAmount", "GrossAmount"),
+}
+CUBE_STATE = "cube_state.json"  # watermark and load generation of the saved cuboids
+
+def lattice():
+    """All cuboids as level tuples: one prefix of each hierarchy, finest first."""
+    prefixes = [[tuple(levels[:i]) for i in range(len(levels) + 1)] for levels in HIERARCHIES.values()]
+    cuboids = [sum(combo, ()) for combo in itertools.product(*prefixes)]
+    return sorted(cuboids, key=len, reverse=True)
+
+def cuboid_name(levels):
+    return "cuboid__" + ("__".join(levels) if levels else "apex")
+
+def compact(df):
+    """Categorical dimension members and downcast integer measures."""
+    for level in df.columns.intersection(LEVELS):
+        if df[level].dtype == object or pd.api.types.is_string_dtype(df[level].dtype):
+            df[level] = df[level].astype("category")
+    for measure in df.columns.intersection(MEASURES):
+        df[measure] = pd.to_numeric(df[measure], downcast="integer")
+    return df
+
+def with_ratios(cells, group_by, measures):
+    """The `group_by` levels and `measures` of summed cells, computing the averages among them."""
+    for ratio in set(measures) & set(RATIOS):
+        numerator, denominator = RATIOS[ratio]
+        cells[ratio] = cells[numerator] / cells[denominator].where(cells[denominator] != 0)
+    return cells[list(group_by) + list(measures)]
+
+def sums_for(measures):
+    """The additive measures needed to answer `measures`, in MEASURES order."""
+    needed = {m for m in measures if m in MEASURES}
+    needed |= {c for m in measures if m in RATIOS for c in RATIOS[m]}
+    unknown = set(measures) - set(MEASURES) - set(RATIOS)
+    if unknown:
+        raise ValueError(f"Unknown cube measures: {sorted(unknown)}")
+    return [m for m in MEASURES if m in needed]
+
+def aggregate(df, levels):
+    """Sums the measures of `df` up to `levels` (NULL members kept as their own group)."""
+    if not levels:
+        return df[MEASURES].sum().to_frame().T.reset_index(drop=True)
+    return df.groupby(list(levels), dropna=False, observed=True)[MEASURES].sum().reset_index()
+
+def align_members(cells, delta, levels):
+    """Gives the delta levels the dtypes of the stored cells (new members added to their categories)."""
+    for level in levels:
+        dtype = cells[level].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            new_members = pd.Index(delta[level].dropna().unique()).difference(dtype.categories)
+            if len(new_members):
+                cells[level] = cells[level].cat.add_categories(new_members)
+            delta[level] = pd.Categorical(delta[level], dtype=cells[level].dtype)
+        elif pd.api.types.is_integer_dtype(dtype) and delta[level].hasnans:
+            cells[level] = cells[level].astype("Int64")
+            delta[level] = delta[level].astype("Int64")
+        else:
+            delta[level] = delta[level].astype(dtype)
+
+def fitted_dtype(dtype, values):
+    """`dtype`, widened only as far as needed to hold `values` (compact() stores the smallest one)."""
+    if not np.issubdtype(dtype, np.integer) or not values.size:
+        return np.result_type(dtype, values.dtype) if values.size else dtype
+    if values.dtype.kind == "f" and not np.array_equal(values, np.round(values)):
+        return np.dtype("float64")
+    info = np.iinfo(dtype)
+    return dtype if info.min <= values.min() and values.max() <= info.max else np.dtype("int64")
+
+def merge_cells(cells, delta, levels):
+    """`cells` with the `delta` cells of the same `levels` added.
+
+    Only stored cells whose members all occur in the delta (an isin
+    pre-filter) are matched against it and summed; new members are
+    appended. The cuboid is never re-grouped, but each measure column is
+    copied once, so the cost still grows with the cuboid's size.
+    """
+    levels = list(levels)
+    cells, delta = cells.copy(deep=False), delta.copy()  # columns are replaced, never written to
+    align_members(cells, delta, levels)
+    if levels:
+        candidates = np.ones(len(cells), dtype=bool)
+        for level in levels:
+            candidates &= cells[level].isin(delta[level]).to_numpy()
+        stored = cells.loc[candidates, levels].assign(position=np.flatnonzero(candidates))
+        matched = stored.merge(delta[levels].assign(row=np.arange(len(delta))), on=levels)
+        positions, rows = matched["position"].to_numpy(), matched["row"].to_numpy()
+    else:
+        positions = rows = np.arange(min(len(cells), 1))
+    added = np.ones(len(delta), dtype=bool)
+    added[rows] = False
+
+    for measure in MEASURES:
+        values = cells[measure].to_numpy()
+        summed = values[positions] + delta[measure].to_numpy()[rows]
+        dtype = fitted_dtype(values.dtype, np.concatenate([summed, delta[measure].to_numpy()[added]]))
+        values = values.astype(dtype)  # a copy, so the stored frame is never modified
+        values[positions] = summed
+        cells[measure] = values
+        delta[measure] = delta[measure].astype(dtype)
+    if not added.any():
+        return cells
+    return pd.concat([cells, delta[added]], ignore_index=True)
+
+class OlapCube:
+    """Materialized cuboid lattice with roll-up / slice / dice / pivot queries."""
+
+    def __init__(self, cuboids, watermark=None, generation=None, changed=None):
+        self.cuboids = cuboids
+        self.watermark = watermark  # highest OrderId aggregated into the cells
+        self.generation = generation  # warehouse load generation the cells reflect
+        self.changed = set(cuboids) if changed is None else changed  # cuboids not saved yet
+        self.directory = None  # where the unchanged cuboids are already saved
+
+    @classmethod
+    def build(cls, df, watermark=None, generation=None):
+        """Builds the lattice from base cube rows (level columns, DeliveredFlag and VALUE_MEASURES).
+
+        Only the finest cuboid scans the rows; each coarser cuboid is rolled up
+        from its smallest already-materialized parent.
+        """
+        rows = df[LEVELS].copy()
+        rows["OrderCount"] = 1
+        rows["DeliveredCount"] = df["DeliveredFlag"].fillna(0).astype(int)
+        for measure in VALUE_MEASURES:
+            rows[measure] = df[measure].astype(float)
+        finest = tuple(LEVELS)
+        cuboids = {finest: compact(aggregate(rows, finest))}
+        for levels in lattice()[1:]:
+            parents = [c for c in cuboids if set(levels) < set(c)]
+            parent = min(parents, key=lambda c: len(cuboids[c]))
+            cuboids[levels] = compact(aggregate(cuboids[parent], levels))
+        return cls(cuboids, watermark, generation)
+
+    def merge(self, delta):
+        """Adds finest-grain delta cells (LEVELS + MEASURES sums of new orders) into every cuboid."""
+        delta = delta[LEVELS + MEASURES]
+        if delta.empty:
+            return
+        for levels in self.cuboids:
+            self.cuboids[levels] = merge_cells(self.cuboids[levels], aggregate(delta, levels), levels)
+            self.changed.add(levels)
+
+    def mismatches(self, totals):
+        """Measures whose grand total differs from `totals` (measure -> fact table total)."""
+        apex = self.cuboids[()].iloc[0] if len(self.cuboids[()]) else pd.Series(0, index=MEASURES)
+        return [m for m in MEASURES
+                if not np.isclose(float(apex[m]), float(totals.get(m) or 0), rtol=1e-9, atol=1e-6)]
+
+    def covering(self, levels):
+        """Smallest materialized cuboid containing all `levels`."""
+        unknown = set(levels) - set(LEVELS)
+        if unknown:
+            raise ValueError(f"Unknown cube levels: {sorted(unknown)}")
+        candidates = [c for c in self.cuboids if set(levels) <= set(c)]
+        return self.cuboids[min(candidates, key=lambda c: len(self.cuboids[c]))]
+
+    def query(self, group_by=(), filters=None, measures=MEASURES):
+        """Aggregates `measures` by `group_by` over cells matching `filters`.
+
+        `filters` maps a level to one member or a list of members; `measures`
+        may include the RATIOS averages.
+        """
+        group_by, filters = list(group_by), filters or {}
+        cells = self.covering(group_by + list(filters))
+        for level, members in filters.items():
+            if isinstance(members, (list, tuple, set)):
+                cells = cells[cells[level].isin(list(members))]
+            else:
+                cells = cells[cells[level] == members]
+        sums = sums_for(measures)
+        if not group_by:
+            cells = cells[sums].sum().to_frame().T.reset_index(drop=True)
+        else:
+            cells = cells.groupby(group_by, observed=True)[sums].sum().reset_index()
+        return with_ratios(cells, group_by, measures)
+
+    def rollup(self, *levels, measures=MEASURES):
+        return self.query(levels, measures=measures)
+
+    def slice(self, level, member, group_by=(), measures=MEASURES):
+        return self.query(group_by, {level: member}, measures)
+
+    def dice(self, filters, group_by=(), measures=MEASURES):
+        return self.query(group_by, filters, measures)
+
+    def pivot(self, rows, columns, measure="OrderCount", filters=None, margins=True):
+        """Cross-tab of `measure` (rows x columns), like pd.crosstab over the raw facts."""
+        if measure in RATIOS:
+            # Ratio of the two pivoted sums, so the margins are averages too
+            numerator, denominator = RATIOS[measure]
+            sums = self.pivot(rows, columns, denominator, filters, margins)
+            return self.pivot(rows, columns, numerator, filters, margins) / sums.where(sums != 0)
+        rows = [rows] if isinstance(rows, str) else list(rows)
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        cells = self.query(rows + columns, filters, [measure])
+        # Plain object members so the "All" margin can be added to the axes
+        cells[rows + columns] = cells[rows + columns].astype(object)
+        # Float values: pivot_table downcasts integer cells, and the margins can then overflow them
+        integer = pd.api.types.is_integer_dtype(cells[measure].dtype)
+        cells[measure] = cells[measure].astype(float)
+        table = pd.pivot_table(cells, index=rows, columns=columns, values=measure, aggfunc="sum",
+                               fill_value=0, margins=margins, margins_name="All", observed=True)
+        return table.astype("int64") if integer else table
+
+    def save(self, directory=CUBE_DIR):
+        """Writes the changed cuboids, then their state (a crash in between leaves no state, so the next load rebuilds).
+
+        Cuboids loaded from `directory` and not merged into since are not rewritten.
+        """
+        os.makedirs(directory, exist_ok=True)
+        state_path = os.path.join(directory, CUBE_STATE)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        for levels, cells in self.cuboids.items():
+            if levels in self.changed or directory != self.directory:
+                write_table(cells, directory, cuboid_name(levels))
+        self.changed, self.directory = set(), directory
+        state = {
+            "watermark": None if self.watermark is None else int(self.watermark),
+            "generation": self.generation,
+            "levels": LEVELS,
+            "measures": MEASURES,
+        }
+        with open(state_path + ".tmp", "w") as f:
+            json.dump(state, f, indent=4)
+        os.replace(state_path + ".tmp", state_path)
+
+    @classmethod
+    def load(cls, directory=CUBE_DIR):
+        """Loads a saved cube, or returns None if none (or one of other levels or measures) has been materialized."""
+        state_path = os.path.join(directory, CUBE_STATE)
+        if not os.path.exists(state_path):
+            return None
+        with open(state_path) as f:
+            state = json.load(f)
+        if state.get("levels") != LEVELS or state.get("measures") != MEASURES:
+            return None
+        if any(find_table(directory, cuboid_name(levels)) is None for levels in lattice()):
+            return None
+        cuboids = {levels: compact(read_table(directory, cuboid_name(levels))) for levels in lattice()}
+        cube = cls(cuboids, state.get("watermark"), state.get("generation"), changed=set())
+        cube.directory = directory
+        return cube
@@ -0,0 +1,151 @@
+# cube_query.py
+"""Lazy slice / dice / roll-up queries pushed down to the warehouse.
+
+A CubeQuery only records the operations applied to it; each call returns a
+new query. `sql()` compiles them into one statement over the point-in-time
+star join, with the predicates in WHERE and the roll-up levels in GROUP BY,
+and `collect()` runs it (through the query cache), so only the result rows
+are fetched:
+
+    CubeQuery().slice("CustomerCountry", "USA").collect(conn)           # order rows
+    CubeQuery().dice({"CustomerCountry": ["USA", "UK"], "Year": 2006}) \\
+        .rollup("EmpFirstName", measures=["OrderCount", "AvgOrderValue"]).collect(conn)
+
+Levels and measures are those of cube_engine; the averages are divided
+after the sums are fetched.
+"""
+from cube_engine import LEVELS, MEASURES, VALUE_MEASURES, with_ratios, sums_for
+from dtype_plan import apply_dtype_plan
+from query_cache import query_cache
+
+# Point-in-time joins: each order gets the customer/employee version valid on its order date
+CUBE_JOINS = """
+FROM FactOrders f
+LEFT JOIN DimDate d ON f.DateId = d.DateId
+LEFT JOIN DimCustomerHistory c ON f.CustomerId = c.CustomerId
+    AND d.FullDate >= c.ValidFrom AND d.FullDate < c.ValidTo
+LEFT JOIN DimEmployeeHistory e ON f.EmployeeId = e.EmployeeId
+    AND d.FullDate >= e.ValidFrom AND d.FullDate < e.ValidTo
+"""
+# Order-level columns of the base cube: (name, expression)
+ROW_COLUMNS = [
+    ("OrderId", "f.OrderId"),
+    ("FullDate", "d.FullDate"),
+    ("CustomerCountry", "c.Country"),
+    ("CustomerCity", "c.City"),
+    ("EmpFirstName", "e.FirstName"),
+    ("DeliveredFlag", "f.DeliveredFlag"),
+    ("Quantity", "f.Quantity"),
+    ("GrossAmount", "f.GrossAmount"),
+    ("DiscountAmount", "f.DiscountAmount"),
+    ("Revenue", "f.Revenue"),
+    ("Cost", "f.Cost"),
+    ("Year", "d.Year"),
+    ("Quarter", "d.Quarter"),
+    ("Month", "d.MonthName"),
+    ("MonthNum", "d.Month"),
+]
+# Cube level -> column of the star join (Month is the month number, as in the cuboids)
+LEVEL_COLUMNS = {
+    "Year": "d.Year",
+    "Quarter": "d.Quarter",
+    "Month": "d.Month",
+    "DateId": "f.DateId",
+    "CustomerCountry": "c.Country",
+    "CustomerCity": "c.City",
+    "EmpFirstName": "e.FirstName",
+}
+MEASURE_SQL = {
+    "OrderCount": "COUNT(*)",
+    "DeliveredCount": "COUNT(CASE WHEN f.DeliveredFlag = 1 THEN 1 END)",
+    **{m: f"SUM(f.{m})" for m in VALUE_MEASURES},
+}
+
+def predicate(level, members):
+    """WHERE condition and parameters selecting `members` (one member or a list) of `level`."""
+    column = LEVEL_COLUMNS[level]
+    if not isinstance(members, (list, tuple, set)):
+        members = [members]
+    members = [m.item() if hasattr(m, "item") else m for m in members]  # numpy scalars -> Python
+    values = [m for m in members if m is not None]
+    conditions = []
+    if len(values) == 1:
+        conditions.append(f"{column} = ?")
+    elif values:
+        conditions.append(f"{column} IN ({', '.join('?' * len(values))})")
+    if len(values) < len(members):
+        conditions.append(f"{column} IS NULL")
+    if not conditions:
+        return "1 = 0", []
+    return "(" + " OR ".join(conditions) + ")", values
+
+class CubeQuery:
+    """Immutable query over the cube's star join, compiled and executed only on collect()."""
+
+    def __init__(self, filters=(), group_by=None, measures=MEASURES, after=None):
+        self.filters = tuple(filters)  # (level, members) pairs, all applied
+        self.after = after  # only orders with a higher OrderId (None: all orders)
+        self.group_by = group_by  # None: order rows; a list of levels: aggregated cells
+        self.measures = list(measures)
+
+    def _with(self, **changes):
+        state = {"filters": self.filters, "group_by": self.group_by, "measures": self.measures,
+                 "after": self.after}
+        state.update(changes)
+        return CubeQuery(**state)
+
+    @staticmethod
+    def _check_levels(levels):
+        unknown = set(levels) - set(LEVELS)
+        if unknown:
+            raise ValueError(f"Unknown cube levels: {sorted(unknown)}")
+
+    def slice(self, level, member):
+        """Restricts the query to one member of `level`."""
+        return self.dice({level: member})
+
+    def dice(self, filters):
+        """Restricts the query to the members of several levels (`filters` maps level -> member(s))."""
+        self._check_levels(filters)
+        return self._with(filters=self.filters + tuple(filters.items()))
+
+    def after_order(self, order_id):
+        """Restricts the query to orders loaded after an OrderId watermark."""
+        return self._with(after=int(order_id))
+
+    def rollup(self, *levels, measures=MEASURES):
+        """Aggregates `measures` (RATIOS averages included) by `levels` instead of returning order rows."""
+        self._check_levels(levels)
+        sums_for(measures)  # unknown measures fail here, not at collect()
+        return self._with(group_by=list(levels), measures=measures)
+
+    def sql(self):
+        """(statement, parameters) of the query."""
+        params, where = [], []
+        for level, members in self.filters:
+            condition, values = predicate(level, members)
+            where.append(condition)
+            params += values
+        if self.after is not None:
+            where.append("f.OrderId > ?")
+            params.append(self.after)
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        if self.group_by is None:
+            select = ",\n    ".join(f"{expr} AS {name}" for name, expr in ROW_COLUMNS)
+            return f"SELECT\n    {select}{CUBE_JOINS}{where_sql}", params
+        columns = [f"{LEVEL_COLUMNS[level]} AS {level}" for level in self.group_by]
+        columns += [f"{MEASURE_SQL[m]} AS {m}" for m in sums_for(self.measures)]
+        sql = f"SELECT\n    {', '.join(columns)}{CUBE_JOINS}{where_sql}"
+        if self.group_by:
+            levels = ", ".join(LEVEL_COLUMNS[level] for level in self.group_by)
+            sql += f"\nGROUP BY {levels}\nORDER BY {levels}"
+        return sql, params
+
+    def collect(self, conn, cache=query_cache):
+        """Runs the query on `conn`; order rows come with compact dtypes, cells with their averages."""
+        sql, params = self.sql()
+        df = cache.read_sql(sql, conn, params or None)
+        if self.group_by is None:
+            return apply_dtype_plan(df)
+        return with_ratios(df, self.group_by, self.measures)
+
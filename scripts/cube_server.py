@@ -0,0 +1,198 @@
+# cube_server.py
+"""JSON query API over the OLAP cube (asyncio, standard library only).
+
+The cube is loaded once at startup (the cuboids saved by olap_cube.py,
+refreshed with the orders loaded since, or built from the warehouse when
+none are saved) and queried read-only.
+Requests are parsed on the event loop; each query runs in a thread pool, so
+slow queries do not block other connections. Identical requests are
+answered from an LRU cache of JSON responses.
+
+    python scripts/cube_server.py [--host 127.0.0.1] [--port 8050] [--rebuild]
+
+Endpoints (GET; lists are comma-separated, levels and measures as in
+cube_engine.HIERARCHIES / MEASURES / RATIOS):
+
+    /levels                                           hierarchies and measures
+    /rollup?levels=Year,CustomerCountry&measures=OrderCount,Revenue
+    /slice?level=CustomerCountry&member=USA&group_by=Year
+    /dice?CustomerCountry=USA,UK&Year=2006&group_by=EmpFirstName
+    /pivot?rows=EmpFirstName&columns=CustomerCountry&measure=AvgOrderValue
+"""
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from cube_engine import HIERARCHIES, LEVELS, MEASURES, RATIOS
+from query_cache import LRUCache
+from settings import CUBE_SERVER_HOST, CUBE_SERVER_PORT, CUBE_SERVER_WORKERS, CUBE_RESPONSE_CACHE_SIZE
+
+INTEGER_LEVELS = {"Year", "Quarter", "Month", "DateId"}
+MAX_REQUEST_BYTES = 64 * 1024
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+class BadRequest(ValueError):
+    pass
+
+def split_list(params, name, default=()):
+    values = [v for value in params.get(name, []) for v in value.split(",") if v]
+    return values or list(default)
+
+def parse_member(level, text):
+    """Query-string member -> cube member (Time levels are integers)."""
+    if level in INTEGER_LEVELS:
+        try:
+            return int(text)
+        except ValueError:
+            raise BadRequest(f"{level} members are integers, got {text!r}")
+    return text
+
+def required(params, name):
+    if not params.get(name):
+        raise BadRequest(f"Missing parameter: {name}")
+    return params[name][0]
+
+def frame_result(df):
+    return json.loads(df.to_json(orient="split", index=False))
+
+class CubeService:
+    """Answers the endpoint queries from one in-memory cube."""
+
+    def __init__(self, cube):
+        self.cube = cube
+        self.routes = {
+            "/levels": self.levels,
+            "/rollup": self.rollup,
+            "/slice": self.slice,
+            "/dice": self.dice,
+            "/pivot": self.pivot,
+        }
+
+    def levels(self, params):
+        return {"hierarchies": HIERARCHIES, "measures": MEASURES, "ratios": {k: list(v) for k, v in RATIOS.items()}}
+
+    def rollup(self, params):
+        measures = split_list(params, "measures", MEASURES)
+        return frame_result(self.cube.rollup(*split_list(params, "levels"), measures=measures))
+
+    def slice(self, params):
+        level = required(params, "level")
+        member = parse_member(level, required(params, "member"))
+        measures = split_list(params, "measures", MEASURES)
+        return frame_result(self.cube.slice(level, member, split_list(params, "group_by"), measures))
+
+    def dice(self, params):
+        filters = {level: [parse_member(level, m) for m in split_list(params, level)]
+                   for level in LEVELS if level in params}
+        if not filters:
+            raise BadRequest(f"Dice needs at least one level filter ({', '.join(LEVELS)})")
+        measures = split_list(params, "measures", MEASURES)
+        return frame_result(self.cube.dice(filters, split_list(params, "group_by"), measures))
+
+    def pivot(self, params):
+        rows, columns = split_list(params, "rows"), split_list(params, "columns")
+        if not rows or not columns:
+            raise BadRequest("Pivot needs rows and columns levels")
+        table = self.cube.pivot(rows, columns,
+                                params.get("measure", ["OrderCount"])[0],
+                                margins=params.get("margins", ["true"])[0].lower() != "false")
+        table.index = [" / ".join(map(str, i)) if isinstance(i, tuple) else str(i) for i in table.index]
+        table.columns = [" / ".join(map(str, c)) if isinstance(c, tuple) else str(c) for c in table.columns]
+        return json.loads(table.to_json(orient="split"))
+
+    def handle(self, path, params):
+        """(status, payload) of one request."""
+        route = self.routes.get(path)
+        if route is None:
+            return 404, {"error": f"Unknown endpoint: {path}", "endpoints": sorted(self.routes)}
+        try:
+            return 200, route(params)
+        except (BadRequest, ValueError, KeyError) as e:
+            return 400, {"error": str(e)}
+
+class CubeServer:
+    """Minimal HTTP/1.1 server (one request per connection) in front of a CubeService."""
+
+    def __init__(self, service, workers=CUBE_SERVER_WORKERS, cache_size=CUBE_RESPONSE_CACHE_SIZE):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.cache = LRUCache(cache_size)
+
+    def cache_key(self, path, params):
+        return path + "?" + "&".join(f"{k}={','.join(v)}" for k, v in sorted(params.items()))
+
+    async def respond(self, method, target):
+        """(status, body bytes, served from cache) for a request line."""
+        if method != "GET":
+            return 405, json.dumps({"error": "Only GET is supported"}).encode("utf-8"), False
+        url = urlsplit(target)
+        path, params = url.path.rstrip("/") or "/", parse_qs(url.query)
+        key = self.cache_key(path, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return 200, cached, True
+        loop = asyncio.get_running_loop()
+        status, payload = await loop.run_in_executor(self.executor, self.service.handle, path, params)
+        body = json.dumps(payload).encode("utf-8")
+        if status == 200:
+            self.cache.put(key, body)
+        return status, body, False
+
+    async def handle_connection(self, reader, writer):
+        start = time.perf_counter()
+        status, method, target, cached = 400, "-", "-", False
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+            method, target, _ = request_line.split(" ", 2)
+            status, body, cached = await self.respond(method, target)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            body = json.dumps({"error": "Malformed request"}).encode("utf-8")
+        except Exception as e:
+            status, body = 500, json.dumps({"error": f"{type(e).__name__}: {e}"}).encode("utf-8")
+            print(f"[ERROR] {method} {target} failed: {e}")
+        writer.write(f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+        source = ", cached" if cached else ""
+        print(f"[API] {method} {target} -> {status} ({(time.perf_counter() - start) * 1000:.1f} ms{source})")
+
+    async def serve(self, host=CUBE_SERVER_HOST, port=CUBE_SERVER_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_REQUEST_BYTES)
+        print(f"--- Cube API listening on http://{host}:{port} ---")
+        async with server:
+            await server.serve_forever()
+
+def load_cube(rebuild=False):
+    """The saved cube brought up to date with the warehouse (rebuilt when missing or `rebuild`)."""
+    from olap_cube import get_connection, refresh_cube
+    conn = get_connection()
+    try:
+        cube = refresh_cube(conn, rebuild)
+    finally:
+        conn.close()
+    print(f"Cube loaded: {len(cube.cuboids)} cuboids.")
+    return cube
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON query API over the OLAP cube")
+    parser.add_argument("--host", default=CUBE_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=CUBE_SERVER_PORT)
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the cube from the warehouse first")
+    args = parser.parse_args()
+
+    server = CubeServer(CubeService(load_cube(args.rebuild)))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("--- Cube API stopped ---")
+
+if __name__ == "__main__":
+    main()
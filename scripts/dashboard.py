@@ -1,12 +1,15 @@
 # dashboard.py
+import argparse
 import os
-import pyodbc
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from olap_cube import generate_olap_report
+from query_cache import query_cache
+from render_pool import render_parallel
+from database_manager import connect_warehouse
 
-from settings import SQL_SERVER, SQL_DATABASE, FIGURES_DIR
+from settings import FIGURES_DIR, RENDER_WORKERS
 
 if not os.path.exists(FIGURES_DIR):
     os.makedirs(FIGURES_DIR)
@@ -17,37 +20,23 @@ plt.rcParams['figure.figsize'] = (12, 6)
 plt.rcParams['savefig.dpi'] = 300
 
 def get_connection():
-    conn_str = f"DRIVER={{SQL Server}};SERVER={SQL_SERVER};DATABASE={SQL_DATABASE};Trusted_Connection=yes;"
-    return pyodbc.connect(conn_str)
+    return connect_warehouse(read_only=True)
 
-def generate_charts():
-    conn = get_connection()
-    
+def plot_country_chart(df):
     # 1. Orders by Country (Horizontal Bar)
-    print("Generating: Orders by Country...")
-    df = pd.read_sql("SELECT c.Country, COUNT(f.OrderId) as OrderCount FROM FactOrders f JOIN DimCustomer c ON f.CustomerId = c.CustomerId GROUP BY c.Country ORDER BY OrderCount DESC", conn)
-    
     plt.figure()
     ax = sns.barplot(data=df.head(10), x="OrderCount", y="Country", palette="viridis", hue="Country", legend=False)
     ax.set_title("Top 10 Active Countries", fontsize=16, fontweight='bold')
     ax.set_xlabel("Number of Orders")
     ax.set_ylabel("")
     plt.tight_layout()
-    plt.savefig(f"{FIGURES_DIR}/orders_by_country.png")
+    save_path = f"{FIGURES_DIR}/orders_by_country.png"
+    plt.savefig(save_path)
     plt.close()
+    return save_path
 
+def plot_trend_chart(df):
     # 2. Daily Order Trend (Line Chart)
-    print("Generating: Order Trend...")
-    query = """
-    SELECT FullDate, COUNT(OrderId) as DailyOrders 
-    FROM FactOrders f 
-    JOIN DimDate d ON f.DateId = d.DateId 
-    WHERE FullDate IS NOT NULL 
-    GROUP BY FullDate 
-    ORDER BY FullDate
-    """
-    df = pd.read_sql(query, conn)
-    
     plt.figure()
     # Enhanced Line Chart
     sns.lineplot(data=df, x="FullDate", y="DailyOrders", color="#3498db", linewidth=3, marker="o", markersize=8, markerfacecolor="#e74c3c")
@@ -69,20 +58,13 @@ def generate_charts():
                  arrowprops=dict(facecolor='black', shrink=0.05), fontsize=10, fontweight='bold')
     
     plt.tight_layout()
-    plt.savefig(f"{FIGURES_DIR}/orders_trend.png")
+    save_path = f"{FIGURES_DIR}/orders_trend.png"
+    plt.savefig(save_path)
     plt.close()
+    return save_path
 
+def plot_employee_chart(df):
     # 3. Employee Performance (Bar Chart)
-    print("Generating: Employee Performance...")
-    query = """
-    SELECT e.FirstName, COUNT(f.OrderId) as Orders 
-    FROM FactOrders f 
-    JOIN DimEmployee e ON f.EmployeeId = e.EmployeeId 
-    GROUP BY e.FirstName 
-    ORDER BY Orders DESC
-    """
-    df = pd.read_sql(query, conn)
-    
     plt.figure()
     sns.barplot(data=df, x="FirstName", y="Orders", palette="magma", hue="FirstName", legend=False)
     plt.title("Employee Performance", fontsize=16, fontweight='bold')
@@ -90,10 +72,50 @@ def generate_charts():
     plt.ylabel("Total Orders Handled")
     plt.xticks(rotation=45)
     plt.tight_layout()
-    plt.savefig(f"{FIGURES_DIR}/employee_performance.png")
+    save_path = f"{FIGURES_DIR}/employee_performance.png"
+    plt.savefig(save_path)
     plt.close()
+    return save_path
+
+def generate_charts(max_workers=RENDER_WORKERS):
+    conn = get_connection()
+    
+    # Queries run first (served from the cache when possible), then the charts render in parallel
+    print("Querying: Orders by Country...")
+    countries = query_cache.read_sql("SELECT c.Country, COUNT(f.OrderId) as OrderCount FROM FactOrders f JOIN DimCustomer c ON f.CustomerId = c.CustomerId GROUP BY c.Country ORDER BY OrderCount DESC", conn)
+
+    print("Querying: Order Trend...")
+    query = """
+    SELECT FullDate, COUNT(OrderId) as DailyOrders 
+    FROM FactOrders f 
+    JOIN DimDate d ON f.DateId = d.DateId 
+    WHERE FullDate IS NOT NULL 
+    GROUP BY FullDate 
+    ORDER BY FullDate
+    """
+    trend = query_cache.read_sql(query, conn)
+
+    print("Querying: Employee Performance...")
+    query = """
+    SELECT e.FirstName, COUNT(f.OrderId) as Orders 
+    FROM FactOrders f 
+    JOIN DimEmployee e ON f.EmployeeId = e.EmployeeId 
+    GROUP BY e.FirstName 
+    ORDER BY Orders DESC
+    """
+    employees = query_cache.read_sql(query, conn)
     
     conn.close()
+    query_cache.report()
+
+    print("Generating charts...")
+    paths = render_parallel([
+        (plot_country_chart, (countries,)),
+        (plot_trend_chart, (trend,)),
+        (plot_employee_chart, (employees,)),
+    ], max_workers)
+    for path in paths:
+        print(f"Saved {path}")
 
 def generate_html_report():
     html_content = """
@@ -140,6 +162,11 @@ def generate_html_report():
     print(f"Dashboard generated at: {os.path.abspath(f'{FIGURES_DIR}/index.html')}")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the dashboard charts and HTML report")
+    parser.add_argument("--no-olap", action="store_true", help="skip the OLAP report (run as its own pipeline stage)")
+    args = parser.parse_args()
+
     generate_charts()
     generate_html_report()
-    generate_olap_report()
+    if not args.no_olap:
+        generate_olap_report()
@@ -1,25 +1,109 @@
 # data_helpers.py
-import pyodbc
+import queue
+import threading
+from contextlib import contextmanager
 import pandas as pd
-from settings import ACCESS_DB_PATH, ACCESS_DRIVER
+from settings import ACCESS_DB_PATH, ACCESS_DRIVER, EXTRACT_CHUNK_SIZE
+from storage import TableWriter, write_table
+from metrics import track
 
 def get_access_connection():
     """Establishes connection to the Access Database."""
     conn_str = f"DRIVER={{{ACCESS_DRIVER}}};DBQ={ACCESS_DB_PATH};"
     try:
-        return pyodbc.connect(conn_str)
+        import pyodbc  # only the Access extraction needs ODBC
+        return track(pyodbc.connect(conn_str))
     except Exception as e:
         print(f"[ERROR] Connection to Access failed: {e}")
         raise
 
-def fetch_from_access(query):
+def fetch_from_access(query, params=None):
     """Executes a SQL query against Access DB and returns a DataFrame."""
     try:
         conn = get_access_connection()
-        print(f"[Access] Executing: {query}")
-        df = pd.read_sql(query, conn)
+        print(f"[Access] Executing: {query}" + (f" {list(params)}" if params else ""))
+        df = pd.read_sql(query, conn, params=params)
         conn.close()
         return df
     except Exception as e:
         print(f"[ERROR] Query failed: {e}")
-        return pd.DataFrame()
+        raise
+
+def iter_from_access(query, chunk_size=EXTRACT_CHUNK_SIZE, params=None):
+    """Streams an Access query as DataFrame chunks (cursor fetchmany under the hood)."""
+    conn = get_access_connection()
+    try:
+        print(f"[Access] Streaming: {query}")
+        if chunk_size is None:
+            yield pd.read_sql(query, conn, params=params)
+            return
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunk_size):
+            yield chunk
+    finally:
+        conn.close()
+
+def export_query(conn, query, directory, name, chunk_size=EXTRACT_CHUNK_SIZE, params=None, fmt=None):
+    """Writes a query result to the storage layer chunk by chunk, keeping memory bounded by chunk_size.
+
+    Data goes to a temporary file first so a failed extraction never leaves a
+    truncated table behind. Returns (path, rows written).
+    """
+    if chunk_size is None:
+        df = pd.read_sql(query, conn, params=params)
+        return write_table(df, directory, name, fmt), len(df)
+    with TableWriter(directory, name, fmt) as writer:
+        for chunk in pd.read_sql(query, conn, params=params, chunksize=chunk_size):
+            writer.write(chunk)
+    return writer.path, writer.rows
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections shared by worker threads.
+
+    At most `max_size` connections are checked out at once; they are opened
+    lazily by `factory` and reused. A connection released with `discard=True`
+    (e.g. after a driver error) is closed and replaced on demand.
+    """
+
+    def __init__(self, factory, max_size):
+        self.factory = factory
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = queue.Queue()
+
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self.factory()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        if discard:
+            try:
+                conn.close()
+            except Exception as e:
+                print(f"[WARN] Closing discarded connection failed: {e}")
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            self.release(conn, discard=True)
+            raise
+        self.release(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -1,114 +1,620 @@
 # database_manager.py
-import pyodbc
-from settings import SQL_SERVER, SQL_DATABASE, SQL_DRIVER
+import re
+import uuid
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from metrics import track
+from settings import LOAD_BATCH_SIZE, FACT_COLUMNSTORE
+from warehouse_backend import get_backend, backend_of
+from date_dimension import build_calendar, calendar_range
 
-def get_sql_conn_str(db="master"):
-    return f"DRIVER={{{SQL_DRIVER}}};SERVER={SQL_SERVER};DATABASE={db};Trusted_Connection=yes;"
+# Star schema definition (table -> column DDL), in FK-safe creation order
+STAR_SCHEMA = {
+    "DimCustomer": """
+        CustomerId INT PRIMARY KEY,
+        CompanyName NVARCHAR(255),
+        City NVARCHAR(100),
+        Country NVARCHAR(100)
+    """,
+    "DimEmployee": """
+        EmployeeId INT PRIMARY KEY,
+        FirstName NVARCHAR(100),
+        LastName NVARCHAR(100),
+        City NVARCHAR(100),
+        Country NVARCHAR(100)
+    """,
+    # Generated calendar (date_dimension.py): one row per day, rows are only ever added
+    "DimDate": """
+        DateId INT PRIMARY KEY,
+        FullDate DATE,
+        Day INT,
+        Month INT,
+        MonthName NVARCHAR(20),
+        Year INT,
+        Quarter INT,
+        Week INT,
+        DayOfWeek INT,
+        DayName NVARCHAR(20),
+        IsWeekend BIT,
+        FiscalYear INT,
+        FiscalQuarter INT,
+        FiscalMonth INT,
+        IsHoliday BIT,
+        HolidayName NVARCHAR(100)
+    """,
+    # SCD Type 2 versions of DimCustomer/DimEmployee (which hold the current rows):
+    # each version is valid from ValidFrom (inclusive) to ValidTo (exclusive)
+    "DimCustomerHistory": """
+        CustomerId INT NOT NULL,
+        CompanyName NVARCHAR(255),
+        City NVARCHAR(100),
+        Country NVARCHAR(100),
+        RowHash BIGINT,
+        ValidFrom DATETIME2 NOT NULL,
+        ValidTo DATETIME2 NOT NULL,
+        IsCurrent BIT,
+        PRIMARY KEY (CustomerId, ValidFrom)
+    """,
+    "DimEmployeeHistory": """
+        EmployeeId INT NOT NULL,
+        FirstName NVARCHAR(100),
+        LastName NVARCHAR(100),
+        City NVARCHAR(100),
+        Country NVARCHAR(100),
+        RowHash BIGINT,
+        ValidFrom DATETIME2 NOT NULL,
+        ValidTo DATETIME2 NOT NULL,
+        IsCurrent BIT,
+        PRIMARY KEY (EmployeeId, ValidFrom)
+    """,
+    "FactOrders": """
+        OrderId INT PRIMARY KEY NONCLUSTERED,
+        CustomerId INT,
+        EmployeeId INT,
+        DateId INT,
+        DeliveredFlag INT,
+        LineCount INT,
+        Quantity FLOAT,
+        GrossAmount FLOAT,
+        DiscountAmount FLOAT,
+        Revenue FLOAT,
+        Cost FLOAT,
+        FOREIGN KEY (CustomerId) REFERENCES DimCustomer(CustomerId),
+        FOREIGN KEY (EmployeeId) REFERENCES DimEmployee(EmployeeId),
+        FOREIGN KEY (DateId) REFERENCES DimDate(DateId)
+    """,
+    # Bumped by every load so query caches know when warehouse results went stale
+    "LoadGeneration": """
+        Id INT PRIMARY KEY,
+        Generation INT
+    """,
+    # Lowest OrderId each load inserted or changed (0: all facts replaced), so the
+    # OLAP cube knows whether its cells below the OrderId watermark went stale
+    "FactChanges": """
+        Generation INT PRIMARY KEY,
+        FirstOrderId INT
+    """,
+    # Random id written when the schema is set up, so a warehouse re-created in the same
+    # database or file (LoadGeneration restarting at 1) is another warehouse to the caches
+    "WarehouseInstance": """
+        Id INT PRIMARY KEY,
+        InstanceId NVARCHAR(32)
+    """,
+    # One row per applied schema migration (see migrate_schema)
+    "SchemaVersion": """
+        Version INT PRIMARY KEY,
+        Description NVARCHAR(255),
+        AppliedAt DATETIME2
+    """
+}
 
-def setup_sql_server():
-    """Ensures SQL Server DB and Schema exist."""
-    print("--- Setting up SQL Server ---")
-    
-    # 1. Create DB if missing
-    try:
-        conn = pyodbc.connect(get_sql_conn_str("master"), autocommit=True)
+# Indexes on the FactOrders join columns (name -> (table, column)); FactOrders itself
+# is clustered on DateId, or stored as a clustered columnstore with FACT_COLUMNSTORE
+STAR_INDEXES = {
+    "IX_FactOrders_CustomerId": ("FactOrders", "CustomerId"),
+    "IX_FactOrders_EmployeeId": ("FactOrders", "EmployeeId"),
+}
+CLUSTERED_INDEX = ("CIX_FactOrders", "FactOrders", "DateId")
+
+# The star tables in FK-safe order; full reloads go through <table>_Staging copies
+# of all but the calendar, which is only ever extended (insert-only, in place)
+STAR_TABLES = ["DimCustomer", "DimEmployee", "DimDate", "FactOrders"]
+CALENDAR_TABLE = "DimDate"
+STAGED_TABLES = [t for t in STAR_TABLES if t != CALENDAR_TABLE]
+STAGING_SUFFIX = "_Staging"
+LOAD_LABELS = ["Customers", "Employees", "Dates", "Orders"]
+FOREIGN_KEY_RE = r"FOREIGN KEY \((\w+)\) REFERENCES (\w+)\s*\((\w+)\)"
+
+# Columns loaded per table, with the pandas dtype each key is coerced to
+LOAD_COLUMNS = {
+    "DimCustomer": ["CustomerId", "CompanyName", "City", "Country"],
+    "DimEmployee": ["EmployeeId", "FirstName", "LastName", "City", "Country"],
+    "DimDate": ["DateId", "FullDate", "Day", "Month", "MonthName", "Year", "Quarter", "Week", "DayOfWeek",
+                "DayName", "IsWeekend", "FiscalYear", "FiscalQuarter", "FiscalMonth", "IsHoliday", "HolidayName"],
+    "FactOrders": ["OrderId", "CustomerId", "EmployeeId", "DateId", "DeliveredFlag",
+                   "LineCount", "Quantity", "GrossAmount", "DiscountAmount", "Revenue", "Cost"],
+}
+KEY_TYPES = {"CustomerId": "Int64", "EmployeeId": "Int64", "OrderId": "Int64", "DateId": "Int64"}  # nullable
+PRIMARY_KEYS = {"DimCustomer": "CustomerId", "DimEmployee": "EmployeeId", "DimDate": "DateId", "FactOrders": "OrderId"}
+
+# SCD Type 2 dimensions: table -> (history table, tracked attribute columns)
+HISTORY_TABLES = {
+    "DimCustomer": ("DimCustomerHistory", ["CompanyName", "City", "Country"]),
+    "DimEmployee": ("DimEmployeeHistory", ["FirstName", "LastName", "City", "Country"]),
+}
+HISTORY_COLUMNS = ["RowHash", "ValidFrom", "ValidTo", "IsCurrent"]
+# First versions start here so facts older than the first load still join; open versions end here
+BEGINNING_OF_TIME = datetime(1900, 1, 1)
+END_OF_TIME = datetime(9999, 12, 31)
+
+def migrate_integer_keys(conn, backend):
+    """v2: INT customer/employee keys (were NVARCHAR(50)) and FactOrders clustered on DateId.
+
+    The star tables are copied aside, re-created with the current DDL and
+    refilled with the keys cast in SQL.
+    """
+    v1_columns = {
+        "DimCustomer": ["CustomerId", "CompanyName", "City", "Country"],
+        "DimEmployee": ["EmployeeId", "FirstName", "LastName", "City", "Country"],
+        "DimDate": ["DateId", "FullDate", "Day", "Month", "MonthName"],
+        "FactOrders": ["OrderId", "CustomerId", "EmployeeId", "DateId", "DeliveredFlag"],
+    }
+    cur = conn.cursor()
+    for table in v1_columns:
+        cur.execute(backend.copy_table_sql(table, f"{table}_Migrate"))
+    for table in reversed(list(v1_columns)):
+        cur.execute(f"DROP TABLE {table}")
+    for table, columns in v1_columns.items():
+        cur.execute(backend.create_table_sql(table, STAR_SCHEMA[table]))
+        select = ", ".join(f"CAST({c} AS INT)" if c in ("CustomerId", "EmployeeId") else c for c in columns)
+        cur.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {select} FROM {table}_Migrate")
+        cur.execute(f"DROP TABLE {table}_Migrate")
+    cur.close()
+
+def migrate_dimension_history(conn, backend):
+    """v3: SCD Type 2 history tables, seeded with one open version per current dimension row."""
+    for table, (history, _) in HISTORY_TABLES.items():
         cur = conn.cursor()
-        cur.execute("SELECT name FROM sys.databases WHERE name = ?", SQL_DATABASE)
-        if not cur.fetchone():
-            print(f"Creating Database: {SQL_DATABASE}")
-            cur.execute(f"CREATE DATABASE {SQL_DATABASE}")
-        else:
-            print(f"Database {SQL_DATABASE} exists.")
-        conn.close()
-    except Exception as e:
-        print(f"[ERROR] Master DB connection failed: {e}")
-        raise
+        cur.execute(backend.create_table_sql(history, STAR_SCHEMA[history]))
+        cur.close()
+        record_history(conn, table, backend.read_sql(f"SELECT * FROM {table}", conn), datetime.now())
+
+def migrate_calendar(conn, backend):
+    """v4: DimDate becomes the generated calendar (gap-free, with year/week/fiscal/holiday columns).
+
+    FactOrders references DimDate, so it is copied aside while DimDate is
+    re-created and filled with the calendar covering the old dates.
+    """
+    v3_fact_columns = ", ".join(["OrderId", "CustomerId", "EmployeeId", "DateId", "DeliveredFlag"])
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(FullDate), MAX(FullDate) FROM DimDate")
+    first, last = cur.fetchone()
+    cur.execute(backend.copy_table_sql("FactOrders", "FactOrders_Migrate"))
+    cur.execute("DROP TABLE FactOrders")
+    cur.execute("DROP TABLE DimDate")
+    for table in ["DimDate", "FactOrders"]:
+        cur.execute(backend.create_table_sql(table, STAR_SCHEMA[table]))
+    cur.close()
+    load_calendar(conn, build_calendar(*calendar_range([d for d in (first, last) if d is not None])))
+    cur = conn.cursor()
+    cur.execute(f"INSERT INTO FactOrders ({v3_fact_columns}) SELECT {v3_fact_columns} FROM FactOrders_Migrate")
+    cur.execute("DROP TABLE FactOrders_Migrate")
+    cur.close()
+
+def table_columns(conn, table):
+    """Column names of a table (from the cursor description of an empty SELECT)."""
+    cur = conn.cursor()
+    cur.execute(f"SELECT * FROM {table} WHERE 1 = 0")
+    columns = [d[0] for d in cur.description]
+    cur.close()
+    return columns
+
+def migrate_order_measures(conn, backend):
+    """v5: order-level measures on FactOrders, summed from Order Details.
 
-    # 2. Create Tables
+    The columns are added in place; existing facts keep NULL measures until
+    the next full reload.
+    """
+    v5_measures = [("LineCount", "INT"), ("Quantity", "FLOAT"), ("GrossAmount", "FLOAT"),
+                   ("DiscountAmount", "FLOAT"), ("Revenue", "FLOAT"), ("Cost", "FLOAT")]
+    existing = table_columns(conn, "FactOrders")  # re-created with them by an earlier migration
+    cur = conn.cursor()
+    for column, sql_type in v5_measures:
+        if column not in existing:
+            cur.execute(f"ALTER TABLE FactOrders ADD {backend.translate_ddl(f'{column} {sql_type}')}")
+    cur.close()
+
+# Schema migrations in order: (version, description, function(conn, backend)).
+# A warehouse created before SchemaVersion existed is version 1.
+MIGRATIONS = [
+    (2, "Integer surrogate keys, FactOrders indexes", migrate_integer_keys),
+    (3, "SCD Type 2 customer and employee history", migrate_dimension_history),
+    (4, "Generated calendar dimension", migrate_calendar),
+    (5, "Order measures from Order Details", migrate_order_measures),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn, backend):
+    """Version of the warehouse layout (0 = empty warehouse)."""
+    if backend.table_exists(conn, "SchemaVersion"):
+        cur = conn.cursor()
+        cur.execute("SELECT MAX(Version) FROM SchemaVersion")
+        version = cur.fetchone()[0]
+        cur.close()
+        if version is not None:
+            return int(version)
+    return 1 if backend.table_exists(conn, "FactOrders") else 0
+
+def record_version(conn, version, description):
+    cur = conn.cursor()
+    cur.execute("INSERT INTO SchemaVersion (Version, Description, AppliedAt) VALUES (?, ?, CURRENT_TIMESTAMP)",
+                (version, description))
+    cur.close()
+
+def migrate_schema(conn, backend=None):
+    """Applies the pending migrations, each in its own transaction; returns the new version."""
+    backend = backend or backend_of(conn)
+    version = schema_version(conn, backend)
+    if version == 0:
+        return version
+    cur = conn.cursor()
+    cur.execute(backend.create_table_sql("SchemaVersion", STAR_SCHEMA["SchemaVersion"]))
+    cur.close()
+    conn.commit()
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        print(f"Migrating warehouse schema to v{target}: {description}...")
+        try:
+            migrate(conn, backend)
+            record_version(conn, target, description)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"[ERROR] Migration to v{target} failed: {e}")
+            raise
+        version = target
+    return version
+
+def setup_warehouse():
+    """Ensures the warehouse database and star schema exist (on the configured backend).
+
+    Existing warehouses are migrated to SCHEMA_VERSION first; missing tables
+    and indexes are then created.
+    """
+    backend = get_backend()
+    backend.ensure_database()
+    conn = connect_warehouse()
     try:
-        conn = pyodbc.connect(get_sql_conn_str(SQL_DATABASE), autocommit=True)
+        fresh = schema_version(conn, backend) == 0
+        migrate_schema(conn, backend)
         cur = conn.cursor()
-        
-        tables = {
-            "DimCustomer": """
-                CustomerId NVARCHAR(50) PRIMARY KEY,
-                CompanyName NVARCHAR(255),
-                City NVARCHAR(100),
-                Country NVARCHAR(100)
-            """,
-            "DimEmployee": """
-                EmployeeId NVARCHAR(50) PRIMARY KEY,
-                FirstName NVARCHAR(100),
-                LastName NVARCHAR(100),
-                City NVARCHAR(100),
-                Country NVARCHAR(100)
-            """,
-            "DimDate": """
-                DateId INT PRIMARY KEY,
-                FullDate DATE,
-                Day INT,
-                Month INT,
-                MonthName NVARCHAR(20)
-            """,
-            "FactOrders": """
-                OrderId INT PRIMARY KEY,
-                CustomerId NVARCHAR(50),
-                EmployeeId NVARCHAR(50),
-                DateId INT,
-                DeliveredFlag INT,
-                FOREIGN KEY (CustomerId) REFERENCES DimCustomer(CustomerId),
-                FOREIGN KEY (EmployeeId) REFERENCES DimEmployee(EmployeeId),
-                FOREIGN KEY (DateId) REFERENCES DimDate(DateId)
-            """
-        }
-
-        for table, schema in tables.items():
-            check_sql = f"IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table}' AND xtype='U') CREATE TABLE {table} ({schema})"
-            cur.execute(check_sql)
-        
-        print("Schema verified.")
-        conn.close()
+        for table, ddl in STAR_SCHEMA.items():
+            cur.execute(backend.create_table_sql(table, ddl))
+        cur.close()
+        backend.ensure_indexes(conn, STAR_INDEXES, CLUSTERED_INDEX, FACT_COLUMNSTORE)
+        if not warehouse_instance(conn, backend):
+            conn.execute("INSERT INTO WarehouseInstance (Id, InstanceId) VALUES (1, ?)", (uuid.uuid4().hex,))
+        if fresh:
+            record_version(conn, SCHEMA_VERSION, "Created")
+        conn.commit()
     except Exception as e:
         print(f"[ERROR] Schema setup failed: {e}")
         raise
+    finally:
+        conn.close()
+    print("Schema verified.")
 
-def clear_tables():
-    """Truncates tables before load."""
-    conn = pyodbc.connect(get_sql_conn_str(SQL_DATABASE), autocommit=True)
+def warehouse_instance(conn, backend=None):
+    """Random id of this warehouse's schema ("" before setup_warehouse has created it)."""
+    backend = backend or backend_of(conn)
+    if not backend.table_exists(conn, "WarehouseInstance"):
+        return ""
     cur = conn.cursor()
-    # Order matters for FK
-    for t in ["FactOrders", "DimDate", "DimEmployee", "DimCustomer"]:
-        try:
-            cur.execute(f"DELETE FROM {t}")
-        except:
-            pass
-    conn.close()
-    print("Target tables cleared.")
-
-def load_data(dim_customers, dim_employees, dim_date, fact_orders):
-    """Inserts DataFrames into SQL Server."""
-    conn = pyodbc.connect(get_sql_conn_str(SQL_DATABASE))
+    cur.execute("SELECT InstanceId FROM WarehouseInstance WHERE Id = 1")
+    row = cur.fetchone()
+    cur.close()
+    return row[0] if row else ""
+
+def connect_warehouse(autocommit=False, read_only=False):
+    """Opens a connection to the warehouse database on the configured backend."""
+    return track(get_backend().connect(autocommit=autocommit, read_only=read_only))
+
+def foreign_keys(tables=STAR_TABLES):
+    """(table, column, referenced table, referenced column) of every FOREIGN KEY in the DDL."""
+    return [(table, *fk) for table in tables for fk in re.findall(FOREIGN_KEY_RE, STAR_SCHEMA[table])]
+
+def staging_ddl(table):
+    """The table's DDL without its FOREIGN KEY clauses (they are added after the swap)."""
+    return re.sub(r",\s*" + FOREIGN_KEY_RE, "", STAR_SCHEMA[table])
+
+def to_param_columns(df, columns):
+    """Converts DataFrame columns into driver-ready Python lists (NaN/NaT -> None)."""
+    values = []
+    for col in columns:
+        s = df[col]
+        if col in KEY_TYPES:
+            s = s.astype(KEY_TYPES[col])
+        if pd.api.types.is_datetime64_any_dtype(s):
+            converted = pd.Series(np.asarray(s.dt.to_pydatetime(), dtype=object), index=s.index, dtype=object)
+        else:
+            converted = s.astype(object)
+        values.append(converted.where(s.notna(), None).tolist())
+    return values
+
+def bulk_insert(conn, table, df, columns, batch_size=LOAD_BATCH_SIZE):
+    """Inserts a DataFrame in executemany chunks, committing once per chunk.
+
+    Works with any qmark DB-API connection (pyodbc, sqlite3, duckdb); pyodbc
+    cursors get fast_executemany so each chunk is sent as one parameter array.
+    DuckDB connections scan the chunk DataFrame directly instead.
+    """
+    if hasattr(conn, "register"):
+        return bulk_insert_frame(conn, table, df, columns, batch_size)
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    cur = conn.cursor()
+    if hasattr(cur, "fast_executemany"):
+        cur.fast_executemany = True
+
+    # Convert one chunk at a time so only batch_size rows of Python objects exist at once
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size]
+        cur.executemany(sql, list(zip(*to_param_columns(chunk, columns))))
+        conn.commit()
+    cur.close()
+    return len(df)
+
+def bulk_insert_frame(conn, table, df, columns, batch_size=LOAD_BATCH_SIZE):
+    """DuckDB path: INSERT ... SELECT straight from each registered DataFrame chunk."""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM load_chunk"
+    for start in range(0, len(df), batch_size):
+        chunk = df.iloc[start:start + batch_size][columns]
+        chunk = chunk.astype({c: KEY_TYPES[c] for c in columns if c in KEY_TYPES})
+        conn.register("load_chunk", chunk)
+        conn.execute(sql)
+        conn.unregister("load_chunk")
+        conn.commit()
+    return len(df)
+
+def stage_frame(conn, backend, table, df, batch_size=LOAD_BATCH_SIZE):
+    """Bulk-copies a DataFrame into a temporary table shaped like `table`; returns the temp table name."""
+    stage = backend.create_temp_table(conn, f"Stage_{table}", staging_ddl(table))
+    bulk_insert(conn, stage, df, LOAD_COLUMNS[table], batch_size)
+    return stage
+
+def joined_source(table, stage, suffix=""):
+    """SELECT of the staged rows whose foreign keys exist in the (suffixed) dimension tables.
+
+    The calendar is never staged, so it is always joined as the live table.
+    """
+    columns = ", ".join(f"s.{c}" for c in LOAD_COLUMNS[table])
+    joins = "".join(f" JOIN {ref}{suffix if ref in STAGED_TABLES else ''} {ref} ON {ref}.{ref_column} = s.{column}"
+                    for _, column, ref, ref_column in foreign_keys([table]))
+    return f"SELECT {columns} FROM {stage} s{joins}"
+
+def insert_missing_sql(table, stage):
+    """INSERT of the staged rows whose key is not in `table` yet (existing rows are left as they are)."""
+    columns = ", ".join(LOAD_COLUMNS[table])
+    key = PRIMARY_KEYS[table]
+    return (f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{key} = s.{key})")
+
+def load_calendar(conn, dim_date, batch_size=LOAD_BATCH_SIZE):
+    """Adds the calendar days missing from DimDate (insert-only); returns how many were added."""
+    backend = backend_of(conn)
+    stage = stage_frame(conn, backend, CALENDAR_TABLE, dim_date, batch_size)
+    before = conn.execute(f"SELECT COUNT(*) FROM {CALENDAR_TABLE}").fetchone()[0]
+    conn.execute(insert_missing_sql(CALENDAR_TABLE, stage))
+    added = conn.execute(f"SELECT COUNT(*) FROM {CALENDAR_TABLE}").fetchone()[0] - before
+    conn.execute(f"DROP TABLE {stage}")
+    conn.commit()
+    return added
+
+def merge_frames(conn, frames, suffix="", merge_facts=False, batch_size=LOAD_BATCH_SIZE):
+    """Loads the star frames through temporary staging tables, set-based.
+
+    Each frame is bulk-copied into a temp table, then merged into its
+    dimension with one MERGE (INSERT ... ON CONFLICT on the embedded
+    backends). Tables with foreign keys get one INSERT ... SELECT (a MERGE
+    with `merge_facts`) joined to their dimensions, so rows with unknown
+    keys are dropped by the database; their count is reported. The calendar
+    only gets the days it is missing, always in the live table. Returns the
+    lowest fact key inserted or changed (None if the facts are unchanged).
+    """
+    backend = backend_of(conn)
+    first_changed = None
+    for table, frame, label in zip(STAR_TABLES, frames, LOAD_LABELS):
+        if table == CALENDAR_TABLE:
+            print(f"Calendar: {load_calendar(conn, frame, batch_size)} new days.")
+            continue
+        print(f"Loading {len(frame)} {label}...")
+        stage = stage_frame(conn, backend, table, frame, batch_size)
+        columns = LOAD_COLUMNS[table]
+        source = joined_source(table, stage, suffix)
+        if foreign_keys([table]):
+            valid = conn.execute(f"SELECT COUNT(*) FROM ({source}) j").fetchone()[0]
+            if valid < len(frame):
+                print(f"[WARN] Dropped {len(frame) - valid} {label.lower()} due to missing foreign keys.")
+            first_changed = conn.execute(first_changed_sql(table, source, suffix)).fetchone()[0]
+        if merge_facts or not foreign_keys([table]):
+            sql = backend.merge_sql(table + suffix, source, columns, PRIMARY_KEYS[table])
+        else:
+            sql = f"INSERT INTO {table}{suffix} ({', '.join(columns)}) {source}"
+        conn.execute(sql)
+        conn.execute(f"DROP TABLE {stage}")
+        conn.commit()
+    return first_changed
+
+def first_changed_sql(table, source, suffix=""):
+    """MIN key of the `source` rows that are missing from the (suffixed) table or differ from it (NULL-safe)."""
+    key = PRIMARY_KEYS[table]
+    same = " AND ".join(f"COALESCE(t.{c}, -1) = COALESCE(s.{c}, -1)" for c in LOAD_COLUMNS[table] if c != key)
+    return (f"SELECT MIN(s.{key}) FROM ({source}) s LEFT JOIN {table}{suffix} t ON t.{key} = s.{key} "
+            f"WHERE t.{key} IS NULL OR NOT ({same})")
+
+def load_data(dim_customers, dim_employees, dim_date, fact_orders, conn=None, batch_size=LOAD_BATCH_SIZE):
+    """Loads the star schema DataFrames (configured warehouse by default, or any qmark DB-API `conn`)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_warehouse()
+
+    try:
+        first_changed = merge_frames(conn, [dim_customers, dim_employees, dim_date, fact_orders],
+                                     batch_size=batch_size)
+        refresh_history(conn, dim_customers, dim_employees, full=False)
+        bump_load_generation(conn, first_changed)
+    finally:
+        if own_conn:
+            conn.close()
+
+def reload_data(dim_customers, dim_employees, dim_date, fact_orders, conn=None, batch_size=LOAD_BATCH_SIZE):
+    """Full reload with no empty-warehouse window.
+
+    The frames are bulk-loaded into <table>_Staging tables while readers keep
+    querying the previous load, then swapped in atomically (renamed over the
+    live tables on SQL Server, copied in one transaction on the embedded
+    backends). The calendar is extended in place.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_warehouse()
+    backend = backend_of(conn)
+
+    try:
+        cur = conn.cursor()
+        for table in STAGED_TABLES:
+            # Leftovers of an interrupted reload
+            cur.execute(f"DROP TABLE IF EXISTS {table}_Old")
+            cur.execute(f"DROP TABLE IF EXISTS {table}{STAGING_SUFFIX}")
+            cur.execute(backend.create_table_sql(table + STAGING_SUFFIX, staging_ddl(table)))
+        cur.close()
+        conn.commit()
+
+        merge_frames(conn, [dim_customers, dim_employees, dim_date, fact_orders], STAGING_SUFFIX,
+                     batch_size=batch_size)
+        if backend.swaps_tables:
+            # Built after the load, on the tables that are about to go live
+            name, table, column = CLUSTERED_INDEX
+            indexes = {n: (t + STAGING_SUFFIX, c) for n, (t, c) in STAR_INDEXES.items()}
+            backend.ensure_indexes(conn, indexes, (name, table + STAGING_SUFFIX, column), FACT_COLUMNSTORE)
+            conn.commit()
+
+        # Before the swap: if it fails, the new load never goes live without its history
+        refresh_history(conn, dim_customers, dim_employees, full=True)
+        print("Swapping in the new load...")
+        backend.swap_tables(conn, STAGED_TABLES, STAGING_SUFFIX, foreign_keys(STAGED_TABLES), PRIMARY_KEYS)
+        bump_load_generation(conn, first_changed=0)  # facts missing from the new load are gone
+        backend.finish_swap(conn, STAGED_TABLES, STAGING_SUFFIX, PRIMARY_KEYS)
+    finally:
+        if own_conn:
+            conn.close()
+
+def first_changed_order(conn, generation):
+    """Lowest OrderId inserted or changed by the loads after `generation` (None if none recorded)."""
     cur = conn.cursor()
+    cur.execute("SELECT MIN(FirstOrderId) FROM FactChanges WHERE Generation > ?", (generation,))
+    row = cur.fetchone()
+    cur.close()
+    return None if row[0] is None else int(row[0])
 
-    print(f"Loading {len(dim_customers)} Customers...")
-    for _, r in dim_customers.iterrows():
-        cur.execute("INSERT INTO DimCustomer (CustomerId, CompanyName, City, Country) VALUES (?, ?, ?, ?)",
-                    str(r["CustomerId"]), r["CompanyName"], r["City"], r["Country"])
+def get_load_generation(conn):
+    """Returns the warehouse load generation counter (0 before the first load)."""
+    cur = conn.cursor()
+    cur.execute("SELECT Generation FROM LoadGeneration WHERE Id = 1")
+    row = cur.fetchone()
+    cur.close()
+    return int(row[0]) if row else 0
 
-    print(f"Loading {len(dim_employees)} Employees...")
-    for _, r in dim_employees.iterrows():
-        cur.execute("INSERT INTO DimEmployee (EmployeeId, FirstName, LastName, City, Country) VALUES (?, ?, ?, ?, ?)",
-                    str(r["EmployeeId"]), r["FirstName"], r["LastName"], r["City"], r["Country"])
+def bump_load_generation(conn, first_changed=None):
+    """Increments the load generation after a load, invalidating cached query results.
 
-    print(f"Loading {len(dim_date)} Dates...")
-    for _, r in dim_date.iterrows():
-        cur.execute("INSERT INTO DimDate (DateId, FullDate, Day, Month, MonthName) VALUES (?, ?, ?, ?, ?)",
-                    int(r["DateId"]), r["FullDate"].to_pydatetime(), r["Day"], r["Month"], r["MonthName"])
+    `first_changed` (the lowest OrderId the load inserted or changed) is
+    recorded in FactChanges in the same transaction.
+    """
+    generation = get_load_generation(conn) + 1
+    cur = conn.cursor()
+    if generation == 1:
+        cur.execute("INSERT INTO LoadGeneration (Id, Generation) VALUES (1, 1)")
+    else:
+        cur.execute("UPDATE LoadGeneration SET Generation = ? WHERE Id = 1", (generation,))
+    if first_changed is not None:
+        cur.execute("INSERT INTO FactChanges (Generation, FirstOrderId) VALUES (?, ?)",
+                    (generation, int(first_changed)))
+    conn.commit()
+    cur.close()
+    return generation
+
+def upsert_data(dim_customers, dim_employees, dim_date, fact_orders, conn=None, batch_size=LOAD_BATCH_SIZE):
+    """Merges delta DataFrames into the warehouse without clearing it (incremental load)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = connect_warehouse()
+
+    try:
+        first_changed = merge_frames(conn, [dim_customers, dim_employees, dim_date, fact_orders],
+                                     merge_facts=True, batch_size=batch_size)
+        refresh_history(conn, dim_customers, dim_employees, full=False)
+        bump_load_generation(conn, first_changed)
+    finally:
+        if own_conn:
+            conn.close()
+
+def row_hashes(df, columns):
+    """Vectorized 64-bit hash of each row's `columns`, as signed BIGINT values."""
+    return pd.util.hash_pandas_object(df[columns], index=False).to_numpy().view(np.int64)
 
-    print(f"Loading {len(fact_orders)} Orders...")
-    for _, r in fact_orders.iterrows():
-        cur.execute("INSERT INTO FactOrders (OrderId, CustomerId, EmployeeId, DateId, DeliveredFlag) VALUES (?, ?, ?, ?, ?)",
-                    int(r["OrderId"]), str(r["CustomerId"]), str(r["EmployeeId"]), r["DateId"], r["DeliveredFlag"])
+def record_history(conn, table, df, loaded_at, full=False):
+    """SCD Type 2 refresh of a dimension's history table from its loaded rows.
 
+    The rows are hashed and compared with the stored RowHash of the current
+    versions, so only new and changed keys are written: their current
+    version is closed at `loaded_at` and a new one opened there. Keys with no
+    history at all open at BEGINNING_OF_TIME; keys closed by an earlier full
+    load reopen at `loaded_at`. With `full`, current keys missing from `df`
+    are closed too. Returns (new, changed, reopened, closed) counts.
+    """
+    backend = backend_of(conn)
+    history, attributes = HISTORY_TABLES[table]
+    key = PRIMARY_KEYS[table]
+    loaded_at = loaded_at.replace(microsecond=0)
+
+    current = backend.read_sql(f"SELECT {key}, RowHash FROM {history} WHERE IsCurrent = 1", conn)
+    current = current.astype({key: "int64", "RowHash": "int64"})
+    known = backend.read_sql(f"SELECT DISTINCT {key} FROM {history}", conn)[key].astype("int64")
+    rows = df[[key] + attributes].astype({key: "int64"}).assign(RowHash=row_hashes(df, attributes))
+    compared = rows.merge(current, on=key, how="left", suffixes=("", "Stored"), indicator=True)
+    is_open = (compared["_merge"] == "both").to_numpy()
+    is_new = ~rows[key].isin(known).to_numpy()
+    is_reopened = ~is_open & ~is_new
+    is_changed = is_open & (compared["RowHash"] != compared["RowHashStored"]).to_numpy()
+
+    closing = compared.loc[is_changed, key]
+    if full:
+        closing = pd.concat([closing, current.loc[~current[key].isin(rows[key]), key]])
+    if len(closing):
+        stage = backend.create_temp_table(conn, f"Stage_{history}", f"{key} INT")
+        bulk_insert(conn, stage, closing.to_frame(), [key])
+        conn.execute(f"UPDATE {history} SET ValidTo = ?, IsCurrent = 0 "
+                     f"WHERE IsCurrent = 1 AND {key} IN (SELECT {key} FROM {stage})", (loaded_at,))
+        conn.execute(f"DROP TABLE {stage}")
+
+    opening = ~is_open | is_changed
+    versions = rows[opening].assign(
+        ValidFrom=np.where(is_new[opening], BEGINNING_OF_TIME, loaded_at).astype("datetime64[s]"),
+        ValidTo=pd.Series(END_OF_TIME, index=rows.index[opening], dtype="datetime64[s]"),
+        IsCurrent=1,
+    )
+    bulk_insert(conn, history, versions, [key] + attributes + HISTORY_COLUMNS)
     conn.commit()
-    conn.close()
+    changed = int(is_changed.sum())
+    return int(is_new.sum()), changed, int(is_reopened.sum()), len(closing) - changed
+
+def refresh_history(conn, dim_customers, dim_employees, full):
+    """Records the customer/employee changes of a load in the SCD Type 2 history."""
+    loaded_at = datetime.now()
+    for table, frame in [("DimCustomer", dim_customers), ("DimEmployee", dim_employees)]:
+        new, changed, reopened, closed = record_history(conn, table, frame, loaded_at, full)
+        if new or changed or reopened or closed:
+            print(f"{HISTORY_TABLES[table][0]}: {new} new, {changed} changed, {reopened} reopened, {closed} closed")
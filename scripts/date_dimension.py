@@ -0,0 +1,62 @@
+# date_dimension.py
+"""Generated calendar dimension (DimDate).
+
+Every day of a date range gets one row, so the dimension has no gaps where
+no orders were placed. Calendar, ISO week, fiscal and US federal holiday
+attributes are computed column-wise once here; consumers read Year/Quarter/...
+instead of deriving them from FullDate.
+"""
+import calendar
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import USFederalHolidayCalendar
+from settings import CALENDAR_START, CALENDAR_END, FISCAL_YEAR_START_MONTH
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+DAY_NAMES = list(calendar.day_name)  # Monday first, like DayOfWeek
+
+def date_ids(dates):
+    """Vectorized YYYYMMDD integer keys; missing dates stay <NA>."""
+    return (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype("Int64")
+
+def calendar_range(dates=None, start=CALENDAR_START, end=CALENDAR_END):
+    """(first, last) day of the calendar: the configured range, widened to whole years covering `dates`."""
+    first, last = pd.Timestamp(start), pd.Timestamp(end)
+    if dates is not None:
+        dates = pd.to_datetime(pd.Series(dates)).dropna()
+        if len(dates):
+            first = min(first, pd.Timestamp(dates.min().year, 1, 1))
+            last = max(last, pd.Timestamp(dates.max().year, 12, 31))
+    return first, last
+
+def build_calendar(first, last, fiscal_start_month=FISCAL_YEAR_START_MONTH):
+    """DimDate rows for every day from `first` to `last` (inclusive).
+
+    The fiscal year starts on the first of `fiscal_start_month` and is named
+    after the calendar year it ends in (1 = the calendar year).
+    """
+    dates = pd.date_range(first, last, freq="D")
+    month = dates.month.to_numpy()
+    day_of_week = dates.dayofweek.to_numpy()  # 0 = Monday
+    fiscal_month = (month - fiscal_start_month) % 12 + 1
+    holidays = USFederalHolidayCalendar().holidays(dates.min(), dates.max(), return_name=True)
+    holiday_names = pd.Series(holidays.to_numpy(), index=holidays.index).reindex(dates)
+
+    return pd.DataFrame({
+        "DateId": dates.year * 10000 + month * 100 + dates.day,
+        "FullDate": dates,
+        "Day": dates.day,
+        "Month": month,
+        "MonthName": pd.Categorical.from_codes(month - 1, MONTH_NAMES),
+        "Year": dates.year,
+        "Quarter": dates.quarter,
+        "Week": dates.isocalendar().week.to_numpy(dtype=np.int64),
+        "DayOfWeek": day_of_week + 1,
+        "DayName": pd.Categorical.from_codes(day_of_week, DAY_NAMES),
+        "IsWeekend": day_of_week >= 5,
+        "FiscalYear": dates.year + ((month >= fiscal_start_month) & (fiscal_start_month > 1)),
+        "FiscalQuarter": (fiscal_month - 1) // 3 + 1,
+        "FiscalMonth": fiscal_month,
+        "IsHoliday": holiday_names.notna().to_numpy(),
+        "HolidayName": holiday_names.to_numpy(),
+    })
@@ -0,0 +1,39 @@
+# dtype_plan.py
+"""Memory-compact dtypes for the denormalized warehouse frames.
+
+Every string column of these frames is a dimension attribute repeated per
+order row (CompanyName, City_x, Country_y, MonthName, ...), so it is stored
+as a categorical; integers are downcast to the smallest type holding their
+values, flags become booleans and FullDate datetime64. Applied wherever a
+warehouse frame is loaded, so CSV and Parquet inputs end up with the same
+dtypes.
+"""
+import pandas as pd
+
+BOOLEAN_COLUMNS = ["DeliveredFlag", "IsWeekend", "IsHoliday"]
+DATETIME_COLUMNS = ["FullDate"]
+
+def memory_mb(df):
+    """Deep memory footprint of a DataFrame in MB (string payloads included)."""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def compact_column(s):
+    if s.name in DATETIME_COLUMNS:
+        return pd.to_datetime(s)
+    if s.name in BOOLEAN_COLUMNS:
+        return s.astype("boolean" if s.hasnans else bool)
+    if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(s.dtype):
+        return s
+    if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+        return s.astype("category")
+    if pd.api.types.is_integer_dtype(s.dtype):
+        return pd.to_numeric(s, downcast="integer")
+    return s
+
+def apply_dtype_plan(df, label=None):
+    """Returns `df` with compact dtypes; with a `label`, prints its memory before and after."""
+    before = memory_mb(df) if label else None
+    df = pd.DataFrame({col: compact_column(df[col]) for col in df.columns}, index=df.index)
+    if label:
+        print(f"[Memory] {label}: {before:.1f} MB -> {memory_mb(df):.1f} MB")
+    return df
@@ -1,18 +1,126 @@
 # etl_pipeline.py
+import json
+import os
+import numpy as np
 import pandas as pd
-from data_helpers import fetch_from_access
-from database_manager import clear_tables, load_data
+from data_helpers import fetch_from_access, iter_from_access
+from database_manager import reload_data, upsert_data
+from date_dimension import date_ids, build_calendar, calendar_range
+from settings import WATERMARK_PATH
+import metrics
+
+def load_watermarks():
+    """Reads the per-source-table high-water marks of the last incremental run."""
+    if not os.path.exists(WATERMARK_PATH):
+        return {}
+    with open(WATERMARK_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_watermarks(watermarks):
+    """Persists high-water marks atomically (only called after a successful load)."""
+    tmp_path = WATERMARK_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(watermarks, f, indent=4)
+    os.replace(tmp_path, WATERMARK_PATH)
+
+OPEN_ORDER_BATCH = 500  # open Order IDs re-read per IN (...) query
+
+def order_ranges(orders_mark):
+    """(WHERE clause, params) pairs selecting the orders to (re-)read: new IDs, then the open ones by ID."""
+    last_id = int(orders_mark.get("Order ID", 0))
+    ranges = [("[Order ID] > ?", [last_id])]
+    open_ids = orders_mark.get("OpenIds", [])
+    for start in range(0, len(open_ids), OPEN_ORDER_BATCH):
+        batch = open_ids[start:start + OPEN_ORDER_BATCH]
+        ranges.append((f"[Order ID] IN ({', '.join('?' * len(batch))})", list(batch)))
+    return ranges
+
+def fetch_orders(table, ranges):
+    frames = [fetch_from_access(f"SELECT * FROM {table} WHERE {where}", params) for where, params in ranges]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def extract_delta(watermarks):
+    """Extracts only rows past the stored watermarks.
+
+    Customers/Employees have no change timestamp in Access, so these small
+    tables are read in full and the load's history hashes find the changed
+    rows. Besides the new orders, the orders that were still unshipped last
+    run are re-read by ID, so late Shipped Date updates are picked up
+    without re-reading everything after the oldest open order.
+    """
+    ranges = order_ranges(watermarks.get("Orders", {}))
 
-def run_etl_pipeline():
-    print("--- Starting ETL Pipeline (Access -> SQL Server) ---")
-    
-    # 1. EXTRACT
     raw_customers = fetch_from_access("SELECT * FROM Customers")
     raw_employees = fetch_from_access("SELECT * FROM Employees")
-    raw_orders = fetch_from_access("SELECT * FROM Orders")
-    
-    # 2. TRANSFORM
-    
+    raw_orders = fetch_orders("Orders", ranges)
+    # Lines of the re-read orders, so their measures are recomputed with them
+    raw_order_details = fetch_orders("[Order Details]", ranges)
+    raw_products = fetch_from_access("SELECT * FROM Products")
+    return raw_customers, raw_employees, raw_orders, raw_order_details, raw_products
+
+def advance_watermarks(watermarks, raw_orders):
+    """Computes the new Orders high-water marks from the extracted delta."""
+    marks = {k: dict(v) for k, v in watermarks.items() if k == "Orders"}
+    if len(raw_orders):
+        prev = marks.get("Orders", {})
+        max_id = int(max(raw_orders["Order ID"].max(), prev.get("Order ID", 0)))
+        max_date = pd.to_datetime(raw_orders["Order Date"]).max()
+        open_ids = raw_orders.loc[raw_orders["Shipped Date"].isna(), "Order ID"]
+        marks["Orders"] = {
+            "Order ID": max_id,
+            "Order Date": str(max_date.date()) if pd.notna(max_date) else prev.get("Order Date"),
+            "OpenIds": sorted(int(i) for i in open_ids.unique()),
+        }
+    return marks
+
+MEASURE_COLUMNS = ["LineCount", "Quantity", "GrossAmount", "DiscountAmount", "Revenue", "Cost"]
+
+def line_totals(raw_order_details, unit_costs):
+    """Order Details lines priced in one vectorized pass and summed per Order ID."""
+    quantity = raw_order_details["Quantity"].fillna(0).to_numpy(dtype=np.float64)
+    gross = quantity * raw_order_details["Unit Price"].fillna(0).to_numpy(dtype=np.float64)
+    discount = gross * raw_order_details["Discount"].fillna(0).to_numpy(dtype=np.float64)
+    unit_cost = raw_order_details["Product ID"].map(unit_costs)
+    lines = pd.DataFrame({
+        "OrderId": raw_order_details["Order ID"].to_numpy(dtype=np.int64),
+        "LineCount": 1,
+        "Quantity": quantity,
+        "GrossAmount": gross,
+        "DiscountAmount": discount,
+        "Revenue": gross - discount,
+        "Cost": quantity * unit_cost.fillna(0).to_numpy(dtype=np.float64),
+    })
+    return lines.groupby("OrderId", sort=False)[MEASURE_COLUMNS].sum()
+
+def order_measures(order_ids, raw_order_details, raw_products):
+    """Order-level measures summed from the order lines, aligned with `order_ids`.
+
+    `raw_order_details` is a DataFrame or an iterable of chunks (e.g.
+    iter_from_access); each chunk is reduced to per-order sums as it
+    arrives, so the lines are never held in memory at once. Standard cost
+    is looked up by product id. Orders without lines get zero measures;
+    without line data every measure is missing.
+    """
+    if raw_order_details is None or raw_products is None:
+        return pd.DataFrame(np.nan, index=range(len(order_ids)), columns=MEASURE_COLUMNS)
+    chunks = [raw_order_details] if isinstance(raw_order_details, pd.DataFrame) else raw_order_details
+    unit_costs = raw_products.set_index("ID")["Standard Cost"]
+    partials = [line_totals(chunk, unit_costs) for chunk in chunks]
+    if not partials:
+        return pd.DataFrame(0.0, index=range(len(order_ids)), columns=MEASURE_COLUMNS).astype({"LineCount": np.int64})
+    # An order's lines can span chunks: their partial sums are added up
+    totals = pd.concat(partials).groupby(level=0, sort=False).sum() if len(partials) > 1 else partials[0]
+    return totals.reindex(order_ids, fill_value=0).reset_index(drop=True)
+
+def transform_sources(raw_customers, raw_employees, raw_orders, raw_order_details=None, raw_products=None):
+    """Vectorized Access -> star schema transform.
+
+    Returns (dim_customers, dim_employees, dim_date, fact_orders). dim_date is
+    the generated calendar, covering every order date. FactOrders carries the
+    order-level measures summed from Order Details (NULL when no line data
+    is given). Missing fact keys stay <NA>; the loader drops facts whose keys
+    are not in the warehouse dimensions (a join in SQL).
+    """
     # --- DimCustomer ---
     # Map raw Access columns to DWH columns
     # Access: ID, Company, City, Country/Region
@@ -25,7 +133,6 @@ def run_etl_pipeline():
     
     # Fill NAs
     dim_customers = dim_customers.fillna("Unknown")
-    dim_customers["CustomerId"] = dim_customers["CustomerId"].astype(str)
 
     # --- DimEmployee ---
     # Access: ID, First Name, Last Name, City, Country/Region
@@ -38,58 +145,61 @@ def run_etl_pipeline():
     })[["EmployeeId", "FirstName", "LastName", "City", "Country"]]
     
     dim_employees = dim_employees.fillna("Unknown")
-    dim_employees["EmployeeId"] = dim_employees["EmployeeId"].astype(str)
 
     # --- DimDate ---
-    # Derived from Orders table
-    raw_orders["OrderDate_Parsed"] = pd.to_datetime(raw_orders["Order Date"])
-    unique_dates = pd.Series(raw_orders["OrderDate_Parsed"].dropna().unique()).sort_values()
-    
-    dim_date = pd.DataFrame({"FullDate": unique_dates})
-    dim_date["DateId"] = dim_date["FullDate"].dt.strftime("%Y%m%d").astype(int)
-    dim_date["Day"] = dim_date["FullDate"].dt.day
-    dim_date["Month"] = dim_date["FullDate"].dt.month
-    dim_date["MonthName"] = dim_date["FullDate"].dt.strftime("%B")
-    dim_date = dim_date.drop_duplicates(subset=["DateId"])
+    # Generated calendar, widened to cover the orders; DateId = year*10000 + month*100 + day
+    order_dates = pd.to_datetime(raw_orders["Order Date"])
+    order_date_ids = date_ids(order_dates)
+    dim_date = build_calendar(*calendar_range(order_dates))
     
     # --- FactOrders ---
     # Access: Order ID, Customer ID, Employee ID, Order Date, Shipped Date
-    # DWH: OrderId, CustomerId, EmployeeId, DateId, DeliveredFlag
-    
-    fact_orders = raw_orders.copy()
-    fact_orders["OrderId"] = fact_orders["Order ID"].astype(int)
-    fact_orders["CustomerId"] = fact_orders["Customer ID"].fillna(-1).astype(int).astype(str) # Handle nulls if any
-    fact_orders["EmployeeId"] = fact_orders["Employee ID"].fillna(-1).astype(int).astype(str)
-    
-    # Map DateId
-    fact_orders["DateId"] = fact_orders["OrderDate_Parsed"].apply(
-        lambda x: int(x.strftime("%Y%m%d")) if pd.notna(x) else None
-    )
-    
-    # Flag
-    fact_orders["DeliveredFlag"] = fact_orders["Shipped Date"].notna().astype(int)
-    
-    fact_orders = fact_orders[["OrderId", "CustomerId", "EmployeeId", "DateId", "DeliveredFlag"]]
+    # DWH: OrderId, CustomerId, EmployeeId, DateId, DeliveredFlag + measures from Order Details / Products
+    order_ids = raw_orders["Order ID"].to_numpy(dtype=np.int64)
+    fact_orders = pd.DataFrame({
+        "OrderId": order_ids,
+        "CustomerId": raw_orders["Customer ID"].astype("Int64"),  # Handle nulls if any
+        "EmployeeId": raw_orders["Employee ID"].astype("Int64"),
+        "DateId": order_date_ids,
+        "DeliveredFlag": raw_orders["Shipped Date"].notna().to_numpy().astype(np.int8),
+    })
+    fact_orders = pd.concat([fact_orders, order_measures(order_ids, raw_order_details, raw_products)], axis=1)
+
+    return dim_customers, dim_employees, dim_date, fact_orders
+
+def run_etl_pipeline(incremental=False):
+    mode = "Incremental" if incremental else "Full"
+    print(f"--- Starting ETL Pipeline (Access -> SQL Server, {mode}) ---")
     
-    # Clean data integrity (filter out facts referencing missing dims if necessary, 
-    # but here we rely on the source DB having referential integrity or we insert unknowns)
-    # Check simple validity:
-    valid_custs = set(dim_customers["CustomerId"])
-    valid_emps = set(dim_employees["EmployeeId"])
-    valid_dates = set(dim_date["DateId"])
+    # 1. EXTRACT
+    with metrics.stage("etl.extract", mode=mode) as stage:
+        if incremental:
+            watermarks = load_watermarks()
+            raw_customers, raw_employees, raw_orders, raw_order_details, raw_products = extract_delta(watermarks)
+            stage.add_rows(len(raw_order_details))
+        else:
+            raw_customers = fetch_from_access("SELECT * FROM Customers")
+            raw_employees = fetch_from_access("SELECT * FROM Employees")
+            raw_orders = fetch_from_access("SELECT * FROM Orders")
+            # Streamed: the largest table is reduced to per-order sums chunk by chunk in the transform
+            raw_order_details = iter_from_access("SELECT * FROM [Order Details]")
+            raw_products = fetch_from_access("SELECT * FROM Products")
+        stage.add_rows(len(raw_customers) + len(raw_employees) + len(raw_orders))
     
-    # Filter facts to only those with valid keys (strict ETL)
-    initial_count = len(fact_orders)
-    fact_orders = fact_orders[
-        fact_orders["CustomerId"].isin(valid_custs) & 
-        fact_orders["EmployeeId"].isin(valid_emps) &
-        fact_orders["DateId"].isin(valid_dates)
-    ]
-    dropped = initial_count - len(fact_orders)
-    if dropped > 0:
-        print(f"[WARN] Dropped {dropped} orders due to missing foreign keys.")
+    # 2. TRANSFORM
+    with metrics.stage("etl.transform", mode=mode) as stage:
+        dim_customers, dim_employees, dim_date, fact_orders = transform_sources(
+            raw_customers, raw_employees, raw_orders, raw_order_details, raw_products
+        )
+        stage.add_rows(len(raw_orders))
 
     # 3. LOAD
-    clear_tables()
-    load_data(dim_customers, dim_employees, dim_date, fact_orders)
+    with metrics.stage("etl.load", mode=mode) as stage:
+        if incremental:
+            upsert_data(dim_customers, dim_employees, dim_date, fact_orders)
+            save_watermarks(advance_watermarks(watermarks, raw_orders))
+        else:
+            reload_data(dim_customers, dim_employees, dim_date, fact_orders)
+            save_watermarks(advance_watermarks({}, raw_orders))
+        stage.add_rows(len(dim_customers) + len(dim_employees) + len(dim_date) + len(fact_orders))
     print("--- ETL Finished Successfully ---")
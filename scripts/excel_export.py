@@ -0,0 +1,63 @@
+# excel_export.py
+"""Streaming Excel export.
+
+Sheets are written with an openpyxl write-only workbook: rows are converted
+and appended one chunk at a time and flushed to disk, so time and memory
+grow linearly with the rows instead of building every cell in memory. Frames
+longer than one sheet continue on Name_2, Name_3, ...
+"""
+import os
+from openpyxl import Workbook
+
+EXCEL_MAX_ROWS = 1_048_576  # per sheet, header included
+EXCEL_CHUNK_ROWS = 50_000  # rows converted to Python values at a time
+SHEET_NAME_LENGTH = 31
+
+def excel_rows(chunk):
+    """Rows of Python values openpyxl can write (NaN/NaT/<NA> -> empty cell)."""
+    columns = []
+    for col in chunk.columns:
+        s = chunk[col]
+        columns.append(s.astype(object).where(s.notna(), None).tolist())
+    return zip(*columns)
+
+def sheet_names(name, sheets):
+    """Names of `sheets` consecutive sheets for one frame (within Excel's 31 characters)."""
+    names = [name[:SHEET_NAME_LENGTH]]
+    for part in range(2, sheets + 1):
+        suffix = f"_{part}"
+        names.append(name[:SHEET_NAME_LENGTH - len(suffix)] + suffix)
+    return names
+
+def write_sheets(wb, name, df, index=False, max_rows=EXCEL_MAX_ROWS, chunk_rows=EXCEL_CHUNK_ROWS):
+    """Appends `df` to the write-only workbook, split over as many sheets as needed; returns their names."""
+    if index:
+        df = df.reset_index()
+    header = [str(c) for c in df.columns]
+    per_sheet = max_rows - 1
+    names = sheet_names(name, max(1, -(-len(df) // per_sheet)))
+    for part, sheet_name in enumerate(names):
+        ws = wb.create_sheet(sheet_name)
+        ws.append(header)
+        end = min(len(df), (part + 1) * per_sheet)
+        for start in range(part * per_sheet, end, chunk_rows):
+            for row in excel_rows(df.iloc[start:min(start + chunk_rows, end)]):
+                ws.append(row)
+    return names
+
+def write_workbook(path, sheets, max_rows=EXCEL_MAX_ROWS):
+    """Streams `sheets` ((name, DataFrame, write index) tuples) into a new .xlsx at `path`.
+
+    The workbook is written to a temporary file first, so a failed export
+    never leaves a truncated report behind.
+    """
+    wb = Workbook(write_only=True)
+    for name, df, index in sheets:
+        names = write_sheets(wb, name, df, index, max_rows)
+        if len(names) > 1:
+            print(f"{name}: {len(df)} rows split over {len(names)} sheets.")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".part"
+    wb.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
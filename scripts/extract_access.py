@@ -1,46 +1,48 @@
-import pandas as pd
-import pyodbc
 import os
-from settings import DATA_DIR
+from data_helpers import export_query
+from settings import DATA_DIR, EXTRACTED_DIR, EXTRACT_CHUNK_SIZE
+from metrics import track
 
 DB_PATH = os.path.join(DATA_DIR, "Northwind 2012.accdb")
 CONN_STR = f"DRIVER={{Microsoft Access Driver (*.mdb, *.accdb)}};DBQ={DB_PATH};"
 
 def get_access_conn():
     try:
-        return pyodbc.connect(CONN_STR)
+        import pyodbc
+        return track(pyodbc.connect(CONN_STR))
     except Exception as e:
         print(f"[ERROR] Connection to Access failed: {e}")
         raise
 
-def extract_from_access():
-    """Extracts tables from Access DB and saves them as CSVs."""
+# List of tables to extract based on inspection
+ACCESS_TABLES = ["Customers", "Employees", "Orders", "Order Details", "Products"]
+
+def extract_access_table(conn, table, chunk_size=EXTRACT_CHUNK_SIZE, fmt=None):
+    """Extracts one Access table to the extracted layer; returns (path, rows)."""
+    # Enclose table name in brackets to handle spaces like 'Order Details'
+    query = f"SELECT * FROM [{table}]"
+    # Sanitize filename (remove spaces)
+    safe_name = table.replace(" ", "_")
+    return export_query(conn, query, EXTRACTED_DIR, f"Access_{safe_name}", chunk_size, fmt=fmt)
+
+def extract_from_access(chunk_size=EXTRACT_CHUNK_SIZE, fmt=None):
+    """Extracts tables from Access DB and streams them to the extracted layer in chunks."""
     print("--- Starting Extraction from Access Database ---")
     
-    output_dir = os.path.join(DATA_DIR, "extracted")
+    output_dir = EXTRACTED_DIR
     os.makedirs(output_dir, exist_ok=True)
     
     conn = get_access_conn()
     
-    # List of tables to extract based on inspection
-    tables = ["Customers", "Employees", "Orders", "Order Details", "Products"]
-    
     try:
-        for table in tables:
+        for table in ACCESS_TABLES:
             print(f"Extracting {table}...")
-            # Enclose table name in brackets to handle spaces like 'Order Details'
-            query = f"SELECT * FROM [{table}]"
-            df = pd.read_sql(query, conn)
-            
-            # Sanitize filename (remove spaces)
-            safe_name = table.replace(" ", "_")
-            output_path = os.path.join(output_dir, f"Access_{safe_name}.csv")
-            
-            df.to_csv(output_path, index=False)
-            print(f"Saved {table} to {output_path}")
+            output_path, rows = extract_access_table(conn, table, chunk_size, fmt)
+            print(f"Saved {rows} rows of {table} to {output_path}")
             
     except Exception as e:
         print(f"[ERROR] Extraction failed during processing: {e}")
+        raise
     finally:
         conn.close()
         print("--- Access Extraction Complete ---")
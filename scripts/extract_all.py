@@ -1,30 +1,118 @@
-from extract_sql import extract_from_sql
-from extract_access import extract_from_access
+from extract_sql import extract_from_sql, extract_sql_table, get_sql_conn, SQL_TABLES
+from extract_access import extract_from_access, extract_access_table, get_access_conn, ACCESS_TABLES
+from data_helpers import ConnectionPool
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from settings import EXTRACT_WORKERS, EXTRACT_POOL_SIZE, EXTRACT_RETRIES, EXTRACT_RETRY_DELAY
+import metrics
+import argparse
 import os
 import sys
+import time
 
 # Ensure immediate output flushing
 sys.stdout.reconfigure(line_buffering=True)
 
+def extract_with_retry(pool, extract_table, table, retries=EXTRACT_RETRIES, delay=EXTRACT_RETRY_DELAY):
+    """Extracts one table on a pooled connection, retrying with backoff; returns a timing record.
+
+    Runs in worker threads, so nothing is printed here: the failed attempts
+    are returned in the record's "log" and reported by the caller.
+    """
+    start = time.perf_counter()
+    log = []
+    for attempt in range(1, retries + 2):
+        try:
+            # A connection that raised is discarded by the pool, so retries get a fresh one
+            with pool.connection() as conn:
+                output_path, rows = extract_table(conn, table)
+            elapsed = time.perf_counter() - start
+            metrics.event("extract_table", table=table, rows=rows, seconds=round(elapsed, 3), attempts=attempt)
+            return {"table": table, "rows": rows, "seconds": elapsed, "attempts": attempt,
+                    "path": output_path, "log": log}
+        except Exception as e:
+            if attempt > retries:
+                raise RuntimeError(f"{e} (after {attempt} attempts)") from e
+            log.append(f"[WARN] {table} attempt {attempt} failed: {e}. Retried after {delay:.1f}s.")
+            time.sleep(delay)
+            delay *= 2
+
+def report_table(timing):
+    """Prints one extracted table's retries and result (from the main thread, so lines never interleave)."""
+    for line in timing["log"]:
+        print(line)
+    print(f"Saved {timing['rows']} rows of {timing['table']} to {timing['path']} ({timing['seconds']:.2f}s)")
+
+def extract_parallel(max_workers=EXTRACT_WORKERS, pool_size=EXTRACT_POOL_SIZE):
+    """Extracts all SQL Server and Access tables concurrently over bounded connection pools.
+
+    The work is I/O bound in the ODBC drivers (which release the GIL), so a
+    thread pool brings wall-clock time close to the slowest single table.
+    """
+    print("--- Starting Parallel Extraction (SQL Server + Access) ---")
+    sql_pool = ConnectionPool(get_sql_conn, pool_size)
+    access_pool = ConnectionPool(get_access_conn, pool_size)
+    tasks = [(sql_pool, extract_sql_table, t) for t in SQL_TABLES] + \
+            [(access_pool, extract_access_table, t) for t in ACCESS_TABLES]
+
+    start = time.perf_counter()
+    timings, failures = [], []
+    try:
+        with metrics.stage("extract", workers=max_workers) as stage, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(extract_with_retry, *task): task[2] for task in tasks}
+            for future in as_completed(futures):
+                try:
+                    timings.append(future.result())
+                    report_table(timings[-1])
+                    stage.add_rows(timings[-1]["rows"])
+                except Exception as e:
+                    print(f"[ERROR] Extraction of {futures[future]} failed: {e}")
+                    failures.append(futures[future])
+    finally:
+        sql_pool.close_all()
+        access_pool.close_all()
+    wall = time.perf_counter() - start
+
+    print("\nPer-table timings:")
+    for t in sorted(timings, key=lambda t: -t["seconds"]):
+        print(f"  {t['table']:<15} {t['rows']:>10} rows  {t['seconds']:8.2f}s  (attempts: {t['attempts']})")
+    print(f"Wall clock: {wall:.2f}s vs {sum(t['seconds'] for t in timings):.2f}s serial sum")
+
+    if failures:
+        raise RuntimeError(f"Failed to extract: {', '.join(failures)}")
+    return timings
+
 def main():
+    parser = argparse.ArgumentParser(description="Extract SQL Server and Access tables")
+    parser.add_argument("--serial", action="store_true", help="extract one table at a time on single connections")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    parser.add_argument("--profile", action="append", default=[], metavar="STAGE",
+                        help="profile a stage (extract, or * for all); repeatable")
+    args = parser.parse_args()
+    metrics.enable_profiling(args.profile)
+
     print("==========================================")
     print("   STARTING DATA EXTRACTION PIPELINE      ")
     print("==========================================")
-    
+
     try:
-        # 1. Extract from SQL Server
-        extract_from_sql()
-        
-        print("\n")
-        
-        # 2. Extract from Access Database
-        extract_from_access()
-        
+        if args.serial:
+            with metrics.stage("extract", workers=1):
+                # 1. Extract from SQL Server
+                extract_from_sql()
+
+                print("\n")
+
+                # 2. Extract from Access Database
+                extract_from_access()
+        else:
+            extract_parallel(max_workers=args.workers)
+
         print("\n")
         print("==========================================")
         print("   ALL EXTRACTIONS COMPLETED SUCCESSFULLY ")
         print("==========================================")
-        
+
     except Exception as e:
         print(f"\n[FATAL ERROR] Pipeline failed: {e}")
         sys.exit(1)
@@ -1,31 +1,32 @@
-import pandas as pd
 import os
-import pyodbc
-from database_manager import get_sql_conn_str, SQL_DATABASE
-from settings import DATA_DIR
+from database_manager import connect_warehouse
+from data_helpers import export_query
+from settings import EXTRACTED_DIR, EXTRACT_CHUNK_SIZE
 
-def extract_from_sql():
-    """Extracts tables from SQL Server and saves them as CSVs."""
+SQL_TABLES = ["DimCustomer", "DimEmployee", "DimDate", "FactOrders"]
+
+def get_sql_conn():
+    return connect_warehouse(read_only=True)
+
+def extract_sql_table(conn, table, chunk_size=EXTRACT_CHUNK_SIZE, fmt=None):
+    """Extracts one SQL Server table to the extracted layer; returns (path, rows)."""
+    query = f"SELECT * FROM {table}"
+    return export_query(conn, query, EXTRACTED_DIR, table, chunk_size, fmt=fmt)
+
+def extract_from_sql(chunk_size=EXTRACT_CHUNK_SIZE, fmt=None):
+    """Extracts tables from SQL Server and streams them to the extracted layer in chunks."""
     print("--- Starting Extraction from SQL Server ---")
     
-    output_dir = os.path.join(DATA_DIR, "extracted")
+    output_dir = EXTRACTED_DIR
     os.makedirs(output_dir, exist_ok=True)
     
-    conn_str = get_sql_conn_str(SQL_DATABASE)
-    
     try:
-        conn = pyodbc.connect(conn_str)
-        
-        tables = ["DimCustomer", "DimEmployee", "DimDate", "FactOrders"]
+        conn = get_sql_conn()
         
-        for table in tables:
+        for table in SQL_TABLES:
             print(f"Extracting {table}...")
-            query = f"SELECT * FROM {table}"
-            df = pd.read_sql(query, conn)
-            
-            output_path = os.path.join(output_dir, f"{table}.csv")
-            df.to_csv(output_path, index=False)
-            print(f"Saved {table} to {output_path}")
+            output_path, rows = extract_sql_table(conn, table, chunk_size, fmt)
+            print(f"Saved {rows} rows of {table} to {output_path}")
             
         conn.close()
         print("--- Extraction Complete ---")
@@ -4,23 +4,26 @@ import seaborn as sns
 import os
 import matplotlib.cm as cm
 import numpy as np
-from settings import DATA_DIR, FIGURES_DIR
+import argparse
+import sys
+from settings import WAREHOUSE_DIR, FIGURES_DIR, RENDER_WORKERS
+from storage import read_table
+from aggregations import plan_aggregates
+from dtype_plan import apply_dtype_plan
+from render_pool import render_parallel
 
 # Ensure figures directory exists
 os.makedirs(FIGURES_DIR, exist_ok=True)
 
 def load_data():
-    data_path = os.path.join(DATA_DIR, "warehouse", "merged_northwind.csv")
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"Warehouse data not found at {data_path}")
-    df = pd.read_csv(data_path)
-    df['FullDate'] = pd.to_datetime(df['FullDate'])
-    return df
+    try:
+        df = read_table(WAREHOUSE_DIR, "merged_northwind")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Warehouse data not found in {WAREHOUSE_DIR}")
+    return apply_dtype_plan(df, "merged_northwind")
 
-def plot_orders_by_country(df):
+def plot_orders_by_country(country_orders):
     plt.figure(figsize=(12, 6))
-    country_orders = df['Country_x'].value_counts().reset_index()
-    country_orders.columns = ['Country', 'OrderCount']
     sns.barplot(data=country_orders, x='Country', y='OrderCount', palette='viridis')
     plt.title('Total Orders by Country')
     plt.xticks(rotation=45)
@@ -29,12 +32,10 @@ def plot_orders_by_country(df):
     plt.savefig(save_path)
     print(f"Saved {save_path}")
     plt.close()
+    return save_path
 
-def plot_orders_by_employee(df):
+def plot_orders_by_employee(employee_orders):
     plt.figure(figsize=(12, 6))
-    df['EmployeeName'] = df['FirstName'] + ' ' + df['LastName']
-    employee_orders = df['EmployeeName'].value_counts().reset_index()
-    employee_orders.columns = ['EmployeeName', 'OrderCount']
     sns.barplot(data=employee_orders, x='OrderCount', y='EmployeeName', palette='magma')
     plt.title('Orders by Employee')
     plt.xlabel('Number of Orders')
@@ -44,12 +45,10 @@ def plot_orders_by_employee(df):
     plt.savefig(save_path)
     print(f"Saved {save_path}")
     plt.close()
+    return save_path
 
-def plot_monthly_trend(df):
+def plot_monthly_trend(monthly_orders):
     plt.figure(figsize=(12, 6))
-    df['YearMonth'] = df['FullDate'].dt.to_period('M')
-    monthly_orders = df.groupby('YearMonth').size().reset_index(name='OrderCount')
-    monthly_orders['YearMonth'] = monthly_orders['YearMonth'].astype(str)
     sns.lineplot(data=monthly_orders, x='YearMonth', y='OrderCount', marker='o')
     plt.title('Monthly Orders Trend')
     plt.xticks(rotation=45)
@@ -60,8 +59,9 @@ def plot_monthly_trend(df):
     plt.savefig(save_path)
     print(f"Saved {save_path}")
     plt.close()
+    return save_path
 
-def plot_3d_orders(df):
+def plot_3d_orders(agg):
     """
     3D Scatter Plot: 
     X = Month (numeric)
@@ -70,11 +70,8 @@ def plot_3d_orders(df):
     """
     from mpl_toolkits.mplot3d import Axes3D
     
-    # Prepare data
-    df['MonthNum'] = df['FullDate'].dt.month
-    
-    # Aggregate: Count orders by Month and Country
-    agg = df.groupby(['MonthNum', 'Country_x']).size().reset_index(name='OrderCount')
+    # agg: order counts by Month and Country (from plan_aggregates)
+    agg = agg.copy()
     
     # Map Country to numeric ID for plotting
     countries = agg['Country_x'].unique()
@@ -111,15 +108,28 @@ def plot_3d_orders(df):
     plt.savefig(save_path)
     print(f"Saved {save_path}")
     plt.close()
+    return save_path
+
+def render_figures(aggs, max_workers=RENDER_WORKERS):
+    """Renders every static figure from the shared aggregates, one process per chart."""
+    tasks = [
+        (plot_orders_by_country, (aggs['country_orders'],)),
+        (plot_orders_by_employee, (aggs['employee_orders'],)),
+        (plot_monthly_trend, (aggs['monthly_orders'],)),
+        (plot_3d_orders, (aggs['month_country'],)),
+    ]
+    return render_parallel(tasks, max_workers)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render static warehouse figures")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="render processes (1 = serial)")
+    args = parser.parse_args()
+
     print("--- Generating Figures ---")
     try:
         df = load_data()
-        plot_orders_by_country(df)
-        plot_orders_by_employee(df)
-        plot_monthly_trend(df)
-        plot_3d_orders(df)
+        render_figures(plan_aggregates(df), args.workers)
         print("--- Figures Generated Successfully ---")
     except Exception as e:
         print(f"[ERROR] Failed to generate figures: {e}")
+        sys.exit(1)
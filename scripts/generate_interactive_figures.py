@@ -3,26 +3,29 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
-from settings import DATA_DIR, FIGURES_DIR
+import sys
+from settings import WAREHOUSE_DIR, FIGURES_DIR
+from storage import read_table
+from aggregations import plan_aggregates
+from dtype_plan import apply_dtype_plan
 
 # Ensure figures directory exists
 os.makedirs(FIGURES_DIR, exist_ok=True)
 
 def load_data():
-    data_path = os.path.join(DATA_DIR, "warehouse", "merged_northwind.csv")
-    if not os.path.exists(data_path):
-        raise FileNotFoundError(f"Warehouse data not found at {data_path}")
-    df = pd.read_csv(data_path)
-    df['FullDate'] = pd.to_datetime(df['FullDate'])
-    return df
+    try:
+        df = read_table(WAREHOUSE_DIR, "merged_northwind")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Warehouse data not found in {WAREHOUSE_DIR}")
+    return apply_dtype_plan(df, "merged_northwind")
 
-def create_delivery_stats(df):
+def create_delivery_stats(aggs):
     """Create interactive pie chart for delivery statistics"""
-    delivery_counts = df['DeliveredFlag'].value_counts()
+    delivery_counts = aggs['delivery_counts']
     
     fig = go.Figure(data=[go.Pie(
         labels=['Delivered', 'Not Delivered'],
-        values=[delivery_counts.get(1, 0), delivery_counts.get(0, 0)],
+        values=[delivery_counts.get(True, 0), delivery_counts.get(False, 0)],
         hole=0.3,
         marker=dict(colors=['#2ecc71', '#e74c3c']),
         textinfo='label+percent+value',
@@ -41,10 +44,9 @@ def create_delivery_stats(df):
     print(f"Saved {save_path}")
     return fig
 
-def create_orders_by_country(df):
+def create_orders_by_country(aggs):
     """Create interactive bar chart for orders by country"""
-    country_orders = df['Country_x'].value_counts().reset_index()
-    country_orders.columns = ['Country', 'OrderCount']
+    country_orders = aggs['country_orders']
     
     fig = px.bar(
         country_orders,
@@ -69,11 +71,9 @@ def create_orders_by_country(df):
     print(f"Saved {save_path}")
     return fig
 
-def create_orders_by_employee(df):
+def create_orders_by_employee(aggs):
     """Create interactive horizontal bar chart for orders by employee"""
-    df['EmployeeName'] = df['FirstName'] + ' ' + df['LastName']
-    employee_orders = df['EmployeeName'].value_counts().reset_index()
-    employee_orders.columns = ['EmployeeName', 'OrderCount']
+    employee_orders = aggs['employee_orders']
     
     fig = px.bar(
         employee_orders,
@@ -97,10 +97,9 @@ def create_orders_by_employee(df):
     print(f"Saved {save_path}")
     return fig
 
-def create_monthly_trend(df):
+def create_monthly_trend(aggs):
     """Create interactive line chart for monthly trends"""
-    df['YearMonth'] = df['FullDate'].dt.to_period('M').astype(str)
-    monthly_orders = df.groupby('YearMonth').size().reset_index(name='OrderCount')
+    monthly_orders = aggs['monthly_orders']
     
     fig = px.line(
         monthly_orders,
@@ -128,10 +127,9 @@ def create_monthly_trend(df):
     print(f"Saved {save_path}")
     return fig
 
-def create_3d_scatter(df):
+def create_3d_scatter(aggs):
     """Create interactive 3D scatter plot"""
-    df['MonthNum'] = df['FullDate'].dt.month
-    agg = df.groupby(['MonthNum', 'Country_x']).size().reset_index(name='OrderCount')
+    agg = aggs['month_country']
     
     fig = px.scatter_3d(
         agg,
@@ -160,10 +158,10 @@ def create_3d_scatter(df):
     print(f"Saved {save_path}")
     return fig
 
-def create_delivery_by_country(df):
+def create_delivery_by_country(aggs):
     """Create stacked bar chart showing delivery status by country"""
-    delivery_by_country = df.groupby(['Country_x', 'DeliveredFlag']).size().reset_index(name='Count')
-    delivery_by_country['Status'] = delivery_by_country['DeliveredFlag'].map({1: 'Delivered', 0: 'Not Delivered'})
+    delivery_by_country = aggs['delivery_by_country'].copy()
+    delivery_by_country['Status'] = delivery_by_country['DeliveredFlag'].map({True: 'Delivered', False: 'Not Delivered'})
     
     fig = px.bar(
         delivery_by_country,
@@ -187,7 +185,7 @@ def create_delivery_by_country(df):
     print(f"Saved {save_path}")
     return fig
 
-def create_dashboard(df):
+def create_dashboard(aggs):
     """Create a comprehensive dashboard with multiple charts"""
     fig = make_subplots(
         rows=2, cols=2,
@@ -197,38 +195,34 @@ def create_dashboard(df):
     )
     
     # Delivery Status Pie
-    delivery_counts = df['DeliveredFlag'].value_counts()
+    delivery_counts = aggs['delivery_counts']
     fig.add_trace(
         go.Pie(labels=['Delivered', 'Not Delivered'],
-               values=[delivery_counts.get(1, 0), delivery_counts.get(0, 0)],
+               values=[delivery_counts.get(True, 0), delivery_counts.get(False, 0)],
                marker=dict(colors=['#2ecc71', '#e74c3c'])),
         row=1, col=1
     )
     
     # Orders by Country
-    country_orders = df['Country_x'].value_counts().head(5).reset_index()
-    country_orders.columns = ['Country', 'Count']
+    country_orders = aggs['country_orders'].head(5)
     fig.add_trace(
-        go.Bar(x=country_orders['Country'], y=country_orders['Count'],
+        go.Bar(x=country_orders['Country'], y=country_orders['OrderCount'],
                marker=dict(color='#3498db')),
         row=1, col=2
     )
     
     # Monthly Trend
-    df['YearMonth'] = df['FullDate'].dt.to_period('M').astype(str)
-    monthly = df.groupby('YearMonth').size().reset_index(name='Count')
+    monthly = aggs['monthly_orders']
     fig.add_trace(
-        go.Scatter(x=monthly['YearMonth'], y=monthly['Count'],
+        go.Scatter(x=monthly['YearMonth'], y=monthly['OrderCount'],
                    mode='lines+markers', line=dict(color='#9b59b6')),
         row=2, col=1
     )
     
     # Top Employees
-    df['EmployeeName'] = df['FirstName'] + ' ' + df['LastName']
-    employee_orders = df['EmployeeName'].value_counts().head(5).reset_index()
-    employee_orders.columns = ['Employee', 'Count']
+    employee_orders = aggs['employee_orders'].head(5)
     fig.add_trace(
-        go.Bar(y=employee_orders['Employee'], x=employee_orders['Count'],
+        go.Bar(y=employee_orders['EmployeeName'], x=employee_orders['OrderCount'],
                orientation='h', marker=dict(color='#e67e22')),
         row=2, col=2
     )
@@ -249,13 +243,16 @@ if __name__ == "__main__":
     print("--- Generating Interactive Figures ---")
     try:
         df = load_data()
-        create_delivery_stats(df)
-        create_orders_by_country(df)
-        create_orders_by_employee(df)
-        create_monthly_trend(df)
-        create_3d_scatter(df)
-        create_delivery_by_country(df)
-        create_dashboard(df)
+        # Every figure is fed from one shared aggregation pass
+        aggs = plan_aggregates(df)
+        create_delivery_stats(aggs)
+        create_orders_by_country(aggs)
+        create_orders_by_employee(aggs)
+        create_monthly_trend(aggs)
+        create_3d_scatter(aggs)
+        create_delivery_by_country(aggs)
+        create_dashboard(aggs)
         print("--- Interactive Figures Generated Successfully ---")
     except Exception as e:
         print(f"[ERROR] Failed to generate figures: {e}")
+        sys.exit(1)
@@ -1,13 +1,27 @@
 # main.py
-from database_manager import setup_sql_server
+import argparse
+import sys
+import metrics
+from database_manager import setup_warehouse
 from etl_pipeline import run_etl_pipeline
 
 def main():
+    parser = argparse.ArgumentParser(description="Access -> SQL Server ETL")
+    parser.add_argument("--incremental", action="store_true",
+                        help="load only rows past the stored watermarks (MERGE instead of truncate-and-reload)")
+    parser.add_argument("--profile", action="append", default=[], metavar="STAGE",
+                        help="profile a stage (e.g. etl.load, or * for all); repeatable")
+    args = parser.parse_args()
+    metrics.enable_profiling(args.profile)
+
     try:
-        setup_sql_server()
-        run_etl_pipeline()
+        with metrics.stage("pipeline", mode="Incremental" if args.incremental else "Full"):
+            with metrics.stage("setup_warehouse"):
+                setup_warehouse()
+            run_etl_pipeline(incremental=args.incremental)
     except Exception as e:
         print(f"\n[FATAL ERROR] Pipeline failed: {e}")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
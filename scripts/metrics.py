@@ -0,0 +1,337 @@
+# metrics.py
+"""Per-stage instrumentation for the pipeline entry points.
+
+Wrap a unit of work in `stage(name)` to record its wall time, rows
+processed, peak RSS and DB round trips (driver calls on connections wrapped
+with `track`). Every finished stage is appended as one JSON line to
+METRICS_LOG_PATH and, when METRICS_PROM_PATH is set, the latest value of each
+stage is rewritten as a Prometheus text file. Stages listed in PROFILE_STAGES
+(or NORTHWIND_PROFILE / --profile) are also run under cProfile or pyinstrument.
+The Prometheus file is shared by every process: each rewrite merges its own
+stages into the samples already there, under a file lock.
+"""
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from settings import METRICS_LOG_PATH, METRICS_PROM_PATH, PROFILE_STAGES, PROFILER, PROFILE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, concurrent writers may drop a stage
+    fcntl = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    from pyinstrument import Profiler as InstrumentProfiler
+except ImportError:
+    InstrumentProfiler = None
+
+RUN_ID = f"{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+RECORDS = []  # finished stage records of this process, in completion order
+
+_lock = threading.Lock()
+_active = []  # stages currently running (nested stages all see the same DB calls)
+_profile_stages = set(PROFILE_STAGES)
+_profiling = False
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it cannot be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class RssSampler:
+    """Polls the RSS in a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.05):
+        self.start = self.peak = current_rss()
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            self.peak = max(self.peak, current_rss())
+
+    def stop(self):
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        return max(self.peak, current_rss())
+
+class Stage:
+    """Counters of one running stage."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.rows = 0
+        self.round_trips = 0
+
+    def add_rows(self, count):
+        self.rows += int(count)
+
+def add_rows(count):
+    """Counts rows towards the innermost running stage (no-op outside a stage)."""
+    with _lock:
+        if _active:
+            _active[-1].add_rows(count)
+
+def count_round_trip():
+    with _lock:
+        for running in _active:
+            running.round_trips += 1
+
+class TrackedCursor:
+    """DB-API cursor proxy that counts execute/fetch calls as round trips."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, "_cursor", cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        # e.g. fast_executemany must reach the driver cursor
+        setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def execute(self, *args):
+        count_round_trip()
+        self._cursor.execute(*args)
+        return self
+
+    def executemany(self, *args):
+        count_round_trip()
+        self._cursor.executemany(*args)
+        return self
+
+    def fetchone(self):
+        count_round_trip()
+        return self._cursor.fetchone()
+
+    def fetchmany(self, *args):
+        count_round_trip()
+        return self._cursor.fetchmany(*args)
+
+    def fetchall(self):
+        count_round_trip()
+        return self._cursor.fetchall()
+
+class TrackedConnection:
+    """DB-API connection proxy whose cursors and commits are counted."""
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def cursor(self):
+        return TrackedCursor(self._conn.cursor())
+
+    def execute(self, *args):
+        count_round_trip()
+        return self._conn.execute(*args)
+
+    def commit(self):
+        count_round_trip()
+        self._conn.commit()
+
+def track(conn):
+    """Wraps a DB-API connection so its driver calls count towards the running stages."""
+    return TrackedConnection(conn)
+
+def unwrap(conn):
+    """The driver connection behind a tracked connection."""
+    return conn._conn if isinstance(conn, TrackedConnection) else conn
+
+def enable_profiling(stages):
+    """Adds stage names (or "*") to profile in this process."""
+    _profile_stages.update(stages)
+
+def start_profiler(name):
+    global _profiling
+    if _profiling or not ({name, "*"} & _profile_stages):
+        return None
+    _profiling = True  # one profiler at a time; nested stages are covered by the outer one
+    if PROFILER == "pyinstrument":
+        if InstrumentProfiler is not None:
+            profiler = InstrumentProfiler()
+            profiler.start()
+            return profiler
+        print("[WARN] pyinstrument not installed, profiling with cProfile.")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def stop_profiler(profiler, name):
+    global _profiling
+    if profiler is None:
+        return None
+    _profiling = False
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{RUN_ID}_{name}")
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        path = base + ".prof"
+        profiler.dump_stats(path)
+    else:
+        profiler.stop()
+        path = base + ".html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+    print(f"[Metrics] Profile of {name} saved to {path}")
+    return path
+
+def event(name, **fields):
+    """Writes a free-form structured record (e.g. per-table timings) to the JSON log."""
+    write_json_line({"ts": datetime.now().isoformat(timespec="milliseconds"), "run_id": RUN_ID,
+                     "event": name, **fields})
+
+def write_json_line(record):
+    os.makedirs(os.path.dirname(METRICS_LOG_PATH), exist_ok=True)
+    with _lock, open(METRICS_LOG_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+def prom_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def unescape_label(text):
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), text)
+
+PROM_SAMPLE = re.compile(r'^(\w+)\{stage="((?:[^"\\]|\\.)*)"\} (\S+)$')
+
+PROM_METRICS = [
+    ("northwind_stage_duration_seconds", "Wall time of the last run of the stage.", "seconds"),
+    ("northwind_stage_rows", "Rows processed by the last run of the stage.", "rows"),
+    ("northwind_stage_rows_per_second", "Throughput of the last run of the stage.", "rows_per_sec"),
+    ("northwind_stage_peak_rss_bytes", "Peak resident memory during the last run of the stage.", "peak_rss_bytes"),
+    ("northwind_stage_db_round_trips", "Database driver calls made by the last run of the stage.", "db_round_trips"),
+    ("northwind_stage_success", "1 if the last run of the stage succeeded, else 0.", "success"),
+    ("northwind_stage_last_run_timestamp_seconds", "Unix time the stage last finished.", "finished"),
+]
+
+@contextmanager
+def file_lock(path):
+    """Exclusive advisory lock on `path` across processes and threads."""
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def read_prometheus(path):
+    """Samples of an existing Prometheus file: stage -> {field: value text}."""
+    fields = {metric: field for metric, _, field in PROM_METRICS}
+    samples = {}
+    if not os.path.exists(path):
+        return samples
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            match = PROM_SAMPLE.match(line.strip())
+            if match and match.group(1) in fields:
+                samples.setdefault(unescape_label(match.group(2)), {})[fields[match.group(1)]] = match.group(3)
+    return samples
+
+def write_prometheus(path=METRICS_PROM_PATH):
+    """Rewrites the Prometheus text file with the latest record of every stage.
+
+    Stages of other processes already in the file are kept; a stage this
+    process ran replaces them only if it finished later.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with file_lock(path + ".lock"):
+        latest = read_prometheus(path)
+        for record in RECORDS:
+            stored = latest.get(record["stage"], {})
+            if float(stored.get("finished", 0)) <= record["finished"]:
+                record = dict(record, success=int(record["status"] == "ok"))
+                latest[record["stage"]] = {field: record[field] for _, _, field in PROM_METRICS
+                                           if record.get(field) is not None}
+        lines = []
+        for metric, help_text, field in PROM_METRICS:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            for name, values in latest.items():
+                if field in values:
+                    lines.append(f'{metric}{{stage="{prom_label(name)}"}} {values[field]}')
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+@contextmanager
+def stage(name, **labels):
+    """Measures the enclosed block as one pipeline stage; yields a Stage for row counts.
+
+    Exceptions are recorded (status "error") and re-raised.
+    """
+    record = Stage(name, labels)
+    sampler = RssSampler()
+    profiler = start_profiler(name)
+    with _lock:
+        _active.append(record)
+    status, error = "ok", None
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        with _lock:
+            _active.remove(record)
+        peak = sampler.stop()
+        stop_profiler(profiler, name)
+        finish(record, status, error, seconds, peak)
+
+def finish(record, status, error, seconds, peak):
+    result = {
+        "ts": datetime.now().isoformat(timespec="milliseconds"),
+        "run_id": RUN_ID,
+        "event": "stage",
+        "stage": record.name,
+        **record.labels,
+        "status": status,
+        "seconds": round(seconds, 3),
+        "rows": record.rows,
+        "rows_per_sec": round(record.rows / seconds, 1) if seconds > 0 else None,
+        "peak_rss_bytes": peak,
+        "db_round_trips": record.round_trips,
+        "finished": round(time.time(), 3),
+    }
+    if error:
+        result["error"] = error
+    RECORDS.append(result)
+    write_json_line(result)
+    if METRICS_PROM_PATH:
+        write_prometheus(METRICS_PROM_PATH)
+    peak_text = f", peak RSS {peak / 1024 ** 2:.0f} MB" if peak else ""
+    print(f"[Metrics] {record.name} {status}: {seconds:.2f}s, {record.rows} rows, "
+          f"{record.round_trips} DB round trips{peak_text}")
@@ -1,101 +1,184 @@
 # olap_cube.py
-import pandas as pd
-import pyodbc
-from settings import SQL_SERVER, SQL_DATABASE, DATA_DIR, FIGURES_DIR
+import argparse
+from settings import FIGURES_DIR, OLAP_EXPORT_DIR, OLAP_RAW_FORMAT
+from database_manager import connect_warehouse, get_load_generation, first_changed_order
+from cube_engine import OlapCube, LEVELS, VALUE_MEASURES
+from cube_query import CubeQuery
+from query_cache import query_cache
+from dtype_plan import apply_dtype_plan
+from date_dimension import date_ids
+from excel_export import write_workbook
+from storage import write_table
+import metrics
 import os
 
+ROW_LEVEL_SHEETS = {"Base_Cube_Raw", "Slice_USA", "Dice_USA_UK_2006"}
+
 def get_connection():
-    conn_str = f"DRIVER={{SQL Server}};SERVER={SQL_SERVER};DATABASE={SQL_DATABASE};Trusted_Connection=yes;"
-    return pyodbc.connect(conn_str)
+    return connect_warehouse(read_only=True)
 
-def generate_olap_report():
-    print("--- Starting OLAP Cube Analysis ---")
+# Every order row of the star join (the unfiltered CubeQuery)
+BASE_CUBE_QUERY, _ = CubeQuery().sql()
+
+def load_base_cube():
+    """Denormalized order rows of the cube (through the query cache, compact dtypes)."""
     conn = get_connection()
+    try:
+        df = query_cache.read_sql(BASE_CUBE_QUERY, conn)
+    finally:
+        conn.close()
+    query_cache.report()
+    # Time attributes come precomputed from the calendar dimension
+    return apply_dtype_plan(df, "Base cube")
+
+def build_cube(df, watermark=None, generation=None):
+    """Materializes the cuboid lattice from base cube rows (numeric Month level, DateId days)."""
+    df = df.drop(columns="Month").rename(columns={"MonthNum": "Month"})
+    df["DateId"] = date_ids(df["FullDate"])
+    return OlapCube.build(df, watermark, generation)
+
+def fact_totals(conn):
+    """(MAX(OrderId), measure -> grand total) straight from FactOrders, for the consistency check."""
+    sums = ", ".join(f"SUM({m})" for m in VALUE_MEASURES)
+    cur = conn.cursor()
+    cur.execute(f"SELECT MAX(OrderId), COUNT(*), COUNT(CASE WHEN DeliveredFlag = 1 THEN 1 END), {sums} FROM FactOrders")
+    row = cur.fetchone()
+    cur.close()
+    return row[0], dict(zip(["OrderCount", "DeliveredCount"] + VALUE_MEASURES, row[1:]))
+
+def refresh_cube(conn, rebuild=False):
+    """The saved cube, brought up to date with the warehouse and saved.
+
+    Orders loaded since the last refresh (OrderId above the cube's
+    watermark) are aggregated by the warehouse and merged into the cuboids,
+    so only the new orders are fetched, not the history. Loads record the
+    lowest OrderId they inserted or changed (FactChanges); when one since the
+    cube's generation reaches the watermark (updated, reassigned or reloaded
+    facts), when no cube is saved or with `rebuild`, the cube is rebuilt from
+    every order row. The merged totals are also checked against FactOrders.
+    """
+    generation = get_load_generation(conn)
+    cube = None if rebuild else OlapCube.load()
+    if cube is not None and cube.generation == generation:
+        print(f"Cube is up to date (load generation {generation}).")
+        return cube
+    if cube is not None and cube.watermark is not None and cube.generation is not None:
+        first_changed = first_changed_order(conn, cube.generation)
+        if first_changed is not None and first_changed <= cube.watermark:
+            print(f"Orders from OrderId {first_changed} changed since the cube was saved, rebuilding.")
+            cube = None
+    if cube is not None and cube.watermark is not None:
+        delta = CubeQuery().after_order(cube.watermark).rollup(*LEVELS).collect(conn, query_cache)
+        cube.merge(delta)
+        watermark, totals = fact_totals(conn)
+        mismatched = cube.mismatches(totals)
+        if not mismatched:
+            orders = int(delta["OrderCount"].sum())
+            metrics.add_rows(orders)
+            print(f"Cube refreshed: {orders} orders after OrderId {cube.watermark} merged as {len(delta)} cells.")
+            cube.watermark, cube.generation = watermark, generation
+            cube.save()
+            return cube
+        print(f"[WARN] Cube totals differ from FactOrders after the delta merge ({', '.join(mismatched)}), rebuilding.")
+
+    print("Building the cube from the warehouse...")
+    rows = CubeQuery().collect(conn, query_cache)
+    metrics.add_rows(len(rows))
+    cube = build_cube(rows, None if rows.empty else int(rows["OrderId"].max()), generation)
+    mismatched = cube.mismatches(fact_totals(conn)[1])
+    if mismatched:
+        print(f"[WARN] Cube totals differ from FactOrders: {', '.join(mismatched)}")
+    cube.save()
+    return cube
+
+def generate_olap_report(raw_format=OLAP_RAW_FORMAT):
+    print("--- Starting OLAP Cube Analysis ---")
     
+    # Every Time x Geography x Employee aggregate is materialized and kept up
+    # to date incrementally; the roll-ups and pivots below are answered from
+    # the smallest covering cuboid
+    conn = get_connection()
+    try:
+        with metrics.stage("cube_refresh"):
+            cube = refresh_cube(conn)
+    finally:
+        conn.close()
+    print(f"Cube materialized: {len(cube.cuboids)} cuboids.")
+
     # 1. Denormalize / Base Cube Creation
     print("Fetching and Denormalizing Data...")
-    query = """
-    SELECT 
-        f.OrderId,
-        d.DateId,
-        d.FullDate,
-        d.Year_ as OrderYear,  -- Need to handle if Year_ column exists or extract it
-        d.MonthName,
-        c.Country as CustomerCountry,
-        c.City as CustomerCity,
-        e.FirstName as EmpFirstName,
-        e.LastName as EmpLastName,
-        f.DeliveredFlag
-    FROM FactOrders f
-    LEFT JOIN DimDate d ON f.DateId = d.DateId
-    LEFT JOIN DimCustomer c ON f.CustomerId = c.CustomerId
-    LEFT JOIN DimEmployee e ON f.EmployeeId = e.EmployeeId
-    """
-    # Since DimDate might not have Year_ column explicitly created in previous steps (only Month/Day),
-    # we will fetch standard cols and derive Year in pandas for safety
-    query_safe = """
-    SELECT 
-        f.OrderId,
-        d.FullDate,
-        c.Country as CustomerCountry,
-        c.City as CustomerCity,
-        e.FirstName as EmpFirstName,
-        f.DeliveredFlag
-    FROM FactOrders f
-    LEFT JOIN DimDate d ON f.DateId = d.DateId
-    LEFT JOIN DimCustomer c ON f.CustomerId = c.CustomerId
-    LEFT JOIN DimEmployee e ON f.EmployeeId = e.EmployeeId
-    """
-    
-    df = pd.read_sql(query_safe, conn)
-    conn.close()
-    
-    # Enhance Data (Pandas-based Cube Attributes)
-    df["FullDate"] = pd.to_datetime(df["FullDate"])
-    df["Year"] = df["FullDate"].dt.year
-    df["Quarter"] = df["FullDate"].dt.quarter
-    df["Month"] = df["FullDate"].dt.month_name()
+    df = load_base_cube().drop(columns="MonthNum")
     
     print(f"Base Cube Loaded: {len(df)} records.")
+    metrics.add_rows(len(df))
     
     # ---------------- OLAP OPERATIONS ----------------
 
     # Operation 1: Roll-up (Aggregation up a hierarchy)
     # Roll-up from Individual Order -> Year/Country Aggregation
-    rollup_year_country = df.groupby(["Year", "CustomerCountry"]).size().reset_index(name="TotalOrders")
+    rollup_year_country = cube.rollup("Year", "CustomerCountry", measures=[
+        "OrderCount", "Quantity", "Revenue", "DiscountAmount", "Cost", "AvgOrderValue", "AvgUnitPrice", "AvgDiscount",
+    ]).rename(columns={"OrderCount": "TotalOrders"})
     print("OLAP Operation: Roll-up (Year, Country) done.")
 
-    # Operation 2: Slice (Filtering a single dimension)
-    # Slice: Only USA Orders
-    slice_usa = df[df["CustomerCountry"] == "USA"].copy()
-    print(f"OLAP Operation: Slice (Country='USA') done. Records: {len(slice_usa)}")
-
-    # Operation 3: Dice (Sub-cube selection)
-    # Dice: USA or UK, Year 2006
-    dice_usa_uk_2006 = df[
-        (df["CustomerCountry"].isin(["USA", "UK"])) & 
-        (df["Year"] == 2006)
-    ].copy()
-    print(f"OLAP Operation: Dice (USA/UK & 2006) done. Records: {len(dice_usa_uk_2006)}")
+    # Slice and dice are pushed down to the warehouse: the predicates run
+    # there and only the matching order rows are fetched
+    conn = get_connection()
+    try:
+        # Operation 2: Slice (Filtering a single dimension)
+        # Slice: Only USA Orders
+        slice_usa = (CubeQuery().slice("CustomerCountry", "USA")
+                     .collect(conn, query_cache).drop(columns="MonthNum"))
+        print(f"OLAP Operation: Slice (Country='USA') done. Records: {len(slice_usa)}")
+
+        # Operation 3: Dice (Sub-cube selection)
+        # Dice: USA or UK, Year 2006
+        dice_usa_uk_2006 = (CubeQuery().dice({"CustomerCountry": ["USA", "UK"], "Year": 2006})
+                            .collect(conn, query_cache).drop(columns="MonthNum"))
+        print(f"OLAP Operation: Dice (USA/UK & 2006) done. Records: {len(dice_usa_uk_2006)}")
+    finally:
+        conn.close()
     
     # Operation 4: Cross-tab / Pivot (Orders by Employee vs Country)
-    pivot_emp_country = pd.crosstab(df["EmpFirstName"], df["CustomerCountry"], margins=True)
+    pivot_emp_country = cube.pivot("EmpFirstName", "CustomerCountry")
+    pivot_revenue = cube.pivot("EmpFirstName", "CustomerCountry", measure="Revenue")
+    pivot_avg_order = cube.pivot("EmpFirstName", "CustomerCountry", measure="AvgOrderValue")
     print("OLAP Operation: Pivot (Employee vs Country) done.")
 
+    # Operation 5: Drill-down to the Day level of the Time hierarchy
+    daily_orders = cube.rollup("DateId", measures=["OrderCount", "Revenue"])
+    print(f"OLAP Operation: Daily counts done. Days: {len(daily_orders)}")
+
     # ---------------- EXPORT ----------------
+    sheets = [  # (name, frame, write index)
+        ("Base_Cube_Raw", df, False),
+        ("Rollup_Year_Country", rollup_year_country, False),
+        ("Slice_USA", slice_usa, False),
+        ("Dice_USA_UK_2006", dice_usa_uk_2006, False),
+        ("Pivot_Emp_Country", pivot_emp_country, True),
+        ("Pivot_Revenue_Emp_Country", pivot_revenue, True),
+        ("Pivot_AvgOrder_Emp_Country", pivot_avg_order, True),
+        ("Daily_Orders", daily_orders, False),
+    ]
+    if raw_format == "parquet":
+        # Row-level tables go to the storage layer; the workbook keeps the aggregates
+        for name, frame, _ in sheets:
+            if name in ROW_LEVEL_SHEETS:
+                print(f"{name} saved to {write_table(frame, OLAP_EXPORT_DIR, name)}")
+        sheets = [sheet for sheet in sheets if sheet[0] not in ROW_LEVEL_SHEETS]
+
     output_path = os.path.join(FIGURES_DIR, "OLAP_Report.xlsx")
     print(f"Exporting to {output_path}...")
-    
     try:
-        with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Base_Cube_Raw", index=False)
-            rollup_year_country.to_excel(writer, sheet_name="Rollup_Year_Country", index=False)
-            slice_usa.to_excel(writer, sheet_name="Slice_USA", index=False)
-            dice_usa_uk_2006.to_excel(writer, sheet_name="Dice_USA_UK_2006", index=False)
-            pivot_emp_country.to_excel(writer, sheet_name="Pivot_Emp_Country")
+        write_workbook(output_path, sheets)
         print("Report generated successfully.")
     except Exception as e:
         print(f"Failed to write Excel: {e}")
 
 if __name__ == "__main__":
-    generate_olap_report()
+    parser = argparse.ArgumentParser(description="OLAP cube report")
+    parser.add_argument("--raw-format", choices=["excel", "parquet"], default=OLAP_RAW_FORMAT,
+                        help="where the row-level sheets (raw cube, slice, dice) go")
+    args = parser.parse_args()
+    with metrics.stage("olap_report"):
+        generate_olap_report(args.raw_format)
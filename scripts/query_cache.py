@@ -0,0 +1,124 @@
+# query_cache.py
+"""Two-tier cache (in-memory LRU + on-disk pickles) for warehouse query results.
+
+Entries are keyed by the normalized SQL text, its parameters and the
+warehouse load generation, so results are reused until load_data bumps the
+generation. Each warehouse (backend, database and its creation, and the
+instance id setup_warehouse writes with the schema) has its own cache
+directory, since every new warehouse starts again at generation 1.
+"""
+import glob
+import hashlib
+import os
+import pickle
+import re
+import threading
+from collections import OrderedDict
+from database_manager import get_load_generation, warehouse_instance
+from warehouse_backend import backend_of
+from settings import QUERY_CACHE_DIR, QUERY_CACHE_SIZE
+
+def normalize_sql(sql):
+    """Collapses whitespace so formatting differences share one cache entry."""
+    return re.sub(r"\s+", " ", sql).strip()
+
+class LRUCache:
+    """Thread-safe least-recently-used mapping with a fixed number of entries."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+class QueryCache:
+    """Serves repeated warehouse queries from memory or disk until the next load."""
+
+    def __init__(self, max_entries=QUERY_CACHE_SIZE, cache_dir=QUERY_CACHE_DIR):
+        self.memory = LRUCache(max_entries)
+        self.cache_dir = cache_dir
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._warehouse = None  # cache subdirectory of the warehouse last queried
+        self._generation = None
+
+    def key(self, sql, params, generation):
+        text = f"{normalize_sql(sql)}|{params!r}"
+        return f"{generation}_{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, self._warehouse, f"{key}.pkl")
+
+    def warehouse_dir(self, conn):
+        """Cache subdirectory name of the warehouse behind `conn`."""
+        backend = backend_of(conn)
+        identity = f"{backend.warehouse_id(conn)}#{warehouse_instance(conn, backend)}"
+        digest = hashlib.sha256(identity.encode("utf-8")).hexdigest()[:16]
+        return f"{backend.name}_{digest}"
+
+    def _drop_stale(self, warehouse, generation):
+        """Forgets entries of other warehouses (memory) and older load generations (memory and disk)."""
+        if (self._warehouse, self._generation) == (warehouse, generation):
+            return
+        self._warehouse, self._generation = warehouse, generation
+        self.memory.clear()
+        for path in glob.glob(os.path.join(self.cache_dir, warehouse, "*.pkl")):
+            if not os.path.basename(path).startswith(f"{generation}_"):
+                os.remove(path)
+
+    def read_sql(self, sql, conn, params=None):
+        """Backend read_sql with caching; returns a copy the caller may modify."""
+        generation = get_load_generation(conn)
+        self._drop_stale(self.warehouse_dir(conn), generation)
+        key = self.key(sql, params, generation)
+
+        df = self.memory.get(key)
+        if df is not None:
+            self.stats["memory_hits"] += 1
+            return df.copy()
+
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                df = pickle.load(f)
+            self.stats["disk_hits"] += 1
+            self.memory.put(key, df)
+            return df.copy()
+
+        self.stats["misses"] += 1
+        df = backend_of(conn).read_sql(sql, conn, params)
+        self.memory.put(key, df)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return df.copy()
+
+    def hit_rate(self):
+        total = sum(self.stats.values())
+        return (self.stats["memory_hits"] + self.stats["disk_hits"]) / total if total else 0.0
+
+    def report(self):
+        s = self.stats
+        print(f"[Cache] generation {self._generation}: {s['memory_hits']} memory hits, "
+              f"{s['disk_hits']} disk hits, {s['misses']} misses ({self.hit_rate():.0%} hit rate)")
+
+# Shared by dashboard and olap_cube within one process
+query_cache = QueryCache()
@@ -0,0 +1,25 @@
+# render_pool.py
+"""Renders independent figures concurrently in worker processes.
+
+Matplotlib rendering is CPU bound and single-threaded, so each figure is
+drawn in its own process. Tasks are (function, args) pairs where the
+function is module-level (picklable), takes only small pre-aggregated data,
+and writes exactly one output file whose path it returns.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from settings import RENDER_WORKERS
+
+def init_worker():
+    # Workers never need a GUI; pin the non-interactive backend
+    import matplotlib
+    matplotlib.use("Agg")
+
+def render_parallel(tasks, max_workers=RENDER_WORKERS):
+    """Runs render tasks and returns their output paths in task order."""
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        return [func(*args) for func, args in tasks]
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+        futures = [executor.submit(func, *args) for func, args in tasks]
+        return [future.result() for future in futures]
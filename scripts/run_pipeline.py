@@ -0,0 +1,237 @@
+# run_pipeline.py
+"""Dependency-aware runner for the pipeline scripts.
+
+Each stage is one script run as a subprocess, with the stages it depends on
+and the files it reads and writes. A stage is skipped when its fingerprint
+(its script and every local module it imports, its arguments, the content of
+its input files and the fingerprints of its dependencies) matches the last
+successful run and its outputs still exist. Failed stages are not recorded,
+so re-running resumes from the first failure. Independent stages (figures,
+interactive figures, OLAP export) run concurrently:
+
+    python scripts/run_pipeline.py [--incremental] [--from STAGE] [--force] [--dry-run]
+"""
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import metrics
+from settings import (ACCESS_DB_PATH, EXTRACTED_DIR, WAREHOUSE_DIR, CUBE_DIR, FIGURES_DIR,
+                      WATERMARK_PATH, DAG_STATE_PATH, DAG_LOG_DIR, DAG_WORKERS)
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class DagStage:
+    """One pipeline script with its dependencies, input files and output files (globs)."""
+
+    def __init__(self, name, script, deps=(), inputs=(), outputs=(), args=()):
+        self.name = name
+        self.script = script
+        self.deps = list(deps)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.args = list(args)
+
+def figure(name):
+    return os.path.join(FIGURES_DIR, name)
+
+STAGES = [
+    DagStage("etl", "main.py", inputs=[ACCESS_DB_PATH], outputs=[WATERMARK_PATH]),
+    # Guard on the streaming extraction: fails when its peak memory grows with the table
+    # size; re-runs only when the extraction code changes
+    DagStage("extract_memory", "benchmark_extract.py", args=["100000"]),
+    DagStage("extract", "extract_all.py", deps=["etl"], inputs=[ACCESS_DB_PATH], outputs=[EXTRACTED_DIR]),
+    DagStage("transform", "transform_warehouse.py", deps=["extract"],
+             inputs=[os.path.join(EXTRACTED_DIR, f"{t}.*") for t in ["DimCustomer", "DimEmployee", "DimDate", "FactOrders"]],
+             outputs=[os.path.join(WAREHOUSE_DIR, "merged_northwind.*")]),
+    DagStage("olap", "olap_cube.py", deps=["etl"], outputs=[CUBE_DIR, figure("OLAP_Report.xlsx")]),
+    DagStage("figures", "generate_figures.py", deps=["transform"],
+             inputs=[os.path.join(WAREHOUSE_DIR, "merged_northwind.*")],
+             outputs=[figure("orders_by_employee.png"), figure("monthly_orders_trend.png"),
+                      figure("3d_orders_by_month_country.png")]),
+    DagStage("interactive_figures", "generate_interactive_figures.py", deps=["transform"],
+             inputs=[os.path.join(WAREHOUSE_DIR, "merged_northwind.*")],
+             outputs=[figure("dashboard_interactive.html")]),
+    # After figures: both write orders_by_country.png (the dashboard version is kept)
+    DagStage("dashboard", "dashboard.py", deps=["etl", "figures"], args=["--no-olap"],
+             outputs=[figure("index.html"), figure("orders_trend.png"), figure("employee_performance.png")]),
+]
+
+def local_modules(script, seen=None):
+    """The script plus every module of this directory it imports, transitively."""
+    seen = set() if seen is None else seen
+    path = os.path.join(SCRIPTS_DIR, script)
+    if script in seen or not os.path.exists(path):
+        return seen
+    seen.add(script)
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_modules(name.split(".")[0] + ".py", seen)
+    return seen
+
+def expand(patterns):
+    """Files matched by the patterns (directories are walked), sorted."""
+    files = []
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isdir(path):
+                files += [os.path.join(root, f) for root, _, names in os.walk(path) for f in names]
+            else:
+                files.append(path)
+    return sorted(set(files))
+
+def hash_files(digest, paths):
+    for path in paths:
+        digest.update(os.path.relpath(path, os.path.dirname(SCRIPTS_DIR)).encode("utf-8"))
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+
+def fingerprint(stage, dep_fingerprints):
+    """Content hash of everything the stage's result depends on."""
+    digest = hashlib.sha256()
+    hash_files(digest, [os.path.join(SCRIPTS_DIR, m) for m in sorted(local_modules(stage.script))])
+    digest.update(json.dumps(stage.args).encode("utf-8"))
+    hash_files(digest, expand(stage.inputs))
+    for dep in stage.deps:
+        digest.update(dep_fingerprints[dep].encode("utf-8"))
+    return digest.hexdigest()
+
+def load_state():
+    if not os.path.exists(DAG_STATE_PATH):
+        return {}
+    with open(DAG_STATE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(state):
+    os.makedirs(os.path.dirname(DAG_STATE_PATH), exist_ok=True)
+    tmp_path = DAG_STATE_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=4)
+    os.replace(tmp_path, DAG_STATE_PATH)
+
+def downstream(stages, names):
+    """`names` plus every stage that (transitively) depends on them."""
+    result = set(names)
+    for stage in stages:  # declared in dependency order
+        if set(stage.deps) & result:
+            result.add(stage.name)
+    return result
+
+def run_stage(stage):
+    """Runs one stage script; its output goes to DAG_LOG_DIR/<stage>.log. Returns (ok, seconds, log)."""
+    os.makedirs(DAG_LOG_DIR, exist_ok=True)
+    log_path = os.path.join(DAG_LOG_DIR, f"{stage.name}.log")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        result = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, stage.script)] + stage.args,
+                                stdout=log, stderr=subprocess.STDOUT, cwd=os.path.dirname(SCRIPTS_DIR),
+                                env=dict(os.environ, PYTHONUNBUFFERED="1"))
+    return result.returncode == 0, time.perf_counter() - start, log_path
+
+def tail(path, lines=15):
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+def run_dag(stages=STAGES, max_workers=DAG_WORKERS, force=(), dry_run=False):
+    """Runs the stages in dependency order, skipping unchanged ones; returns the failed stage names."""
+    by_name = {s.name: s for s in stages}
+    state = load_state()
+    forced = downstream(stages, force)
+    fingerprints, done, failed, blocked = {}, set(), set(), set()
+    pending = [s.name for s in stages]
+    running = {}
+
+    def ready(name):
+        return all(dep in done for dep in by_name[name].deps)
+
+    def launch(name):
+        """Skips the stage if unchanged, else submits it."""
+        stage = by_name[name]
+        fingerprints[name] = fingerprint(stage, fingerprints)
+        unchanged = state.get(name, {}).get("fingerprint") == fingerprints[name]
+        outputs_present = all(glob.glob(pattern) for pattern in stage.outputs)
+        if name not in forced and unchanged and outputs_present:
+            print(f"[DAG] {name}: unchanged, skipped")
+            metrics.event("dag_stage", stage=name, status="skipped")
+            done.add(name)
+        elif dry_run:
+            reason = "forced" if name in forced else "changed" if not unchanged else "outputs missing"
+            print(f"[DAG] {name}: would run ({reason})")
+            done.add(name)
+        else:
+            print(f"[DAG] {name}: running {stage.script} {' '.join(stage.args)}".rstrip())
+            running[executor.submit(run_stage, stage)] = name
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in [n for n in pending if ready(n)]:
+                    pending.remove(name)
+                    progressed = True
+                    launch(name)
+
+            if not running:
+                # Nothing in flight and nothing ready: the rest depends on a failure
+                blocked.update(pending)
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                ok, seconds, log_path = future.result()
+                metrics.event("dag_stage", stage=name, status="ok" if ok else "error", seconds=round(seconds, 3))
+                if ok:
+                    print(f"[DAG] {name}: done in {seconds:.1f}s")
+                    state[name] = {"fingerprint": fingerprints[name], "finished": time.strftime("%Y-%m-%d %H:%M:%S")}
+                    save_state(state)
+                    done.add(name)
+                else:
+                    print(f"[DAG] {name}: FAILED after {seconds:.1f}s (log: {log_path})\n{tail(log_path)}")
+                    # Forget the last success so the next run retries it
+                    state.pop(name, None)
+                    save_state(state)
+                    failed.add(name)
+
+    for name in blocked:
+        print(f"[DAG] {name}: not run (depends on a failed stage)")
+    return sorted(failed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the BI pipeline stages in dependency order")
+    parser.add_argument("--incremental", action="store_true", help="run the ETL stage in incremental mode")
+    parser.add_argument("--from", dest="from_stage", action="append", default=[], metavar="STAGE",
+                        choices=[s.name for s in STAGES], help="re-run this stage and everything after it")
+    parser.add_argument("--force", action="store_true", help="re-run every stage")
+    parser.add_argument("--dry-run", action="store_true", help="only show which stages would run")
+    parser.add_argument("--workers", type=int, default=DAG_WORKERS)
+    args = parser.parse_args()
+
+    if args.incremental:
+        STAGES[0].args.append("--incremental")
+    force = [s.name for s in STAGES] if args.force else args.from_stage
+
+    print("--- Running BI Pipeline ---")
+    failed = run_dag(STAGES, args.workers, force, args.dry_run)
+    if failed:
+        print(f"--- Pipeline failed: {', '.join(failed)} ---")
+        sys.exit(1)
+    print("--- Pipeline Finished Successfully ---")
+
+if __name__ == "__main__":
+    main()
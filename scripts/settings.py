@@ -3,14 +3,82 @@ import os
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
-FIGURES_DIR = os.path.join(BASE_DIR, "figures")
+# NORTHWIND_DATA_DIR / NORTHWIND_FIGURES_DIR redirect all outputs (used by benchmark_pipeline.py)
+DATA_DIR = os.environ.get("NORTHWIND_DATA_DIR", os.path.join(BASE_DIR, "data"))
+FIGURES_DIR = os.environ.get("NORTHWIND_FIGURES_DIR", os.path.join(BASE_DIR, "figures"))
+EXTRACTED_DIR = os.path.join(DATA_DIR, "extracted")
+WAREHOUSE_DIR = os.path.join(DATA_DIR, "warehouse")
 ACCESS_DB_PATH = os.path.join(DATA_DIR, "Northwind 2012.accdb")
+CUBE_DIR = os.path.join(DATA_DIR, "cube")  # materialized OLAP aggregates
+QUERY_CACHE_DIR = os.path.join(DATA_DIR, "cache")  # on-disk query result cache
+OLAP_EXPORT_DIR = os.path.join(DATA_DIR, "olap")  # row-level OLAP report tables when not written to Excel
+WATERMARK_PATH = os.path.join(DATA_DIR, "etl_watermarks.json")  # incremental ETL state
 
 # SQL Server Config
 SQL_SERVER = r".\SQLEXPRESS" # or r".\OMARRAYANE"
 SQL_DATABASE = "Global_Northwind"
 SQL_DRIVER = "SQL Server"
 
+# Warehouse Backend Config
+# "sqlserver", "duckdb" (embedded columnar, falls back to "sqlite" without duckdb) or "sqlite"
+WAREHOUSE_BACKEND = os.environ.get("NORTHWIND_WAREHOUSE_BACKEND", "sqlserver")
+WAREHOUSE_DB_PATH = os.path.join(DATA_DIR, "warehouse", "northwind_dw")  # embedded file (.duckdb / .sqlite added)
+FACT_COLUMNSTORE = False  # SQL Server: store FactOrders as a clustered columnstore instead of clustered on DateId
+
+# Calendar Config (DimDate is generated for this range, widened to cover every order date)
+CALENDAR_START = "2000-01-01"
+CALENDAR_END = "2030-12-31"
+FISCAL_YEAR_START_MONTH = 7  # fiscal years run July-June, named after the year they end in (1 = calendar year)
+
 # Access Config
 ACCESS_DRIVER = "Microsoft Access Driver (*.mdb, *.accdb)"
+
+# Storage Config
+STORAGE_FORMAT = "parquet"  # "parquet" (needs pyarrow) or "csv"
+PARQUET_COMPRESSION = "snappy"
+WAREHOUSE_PARTITION_COLS = None  # e.g. ["Year", "Month"] to partition the warehouse by date
+EXPORT_CSV = False  # also write a CSV copy of the warehouse for export
+
+# Query Cache Config
+QUERY_CACHE_SIZE = 64  # results kept in the in-memory LRU tier
+
+# OLAP Report Config
+# "excel": raw cube, slice and dice rows go into OLAP_Report.xlsx (streamed, split past 1,048,576 rows);
+# "parquet": they go to OLAP_EXPORT_DIR through the storage layer and the workbook carries only the aggregates
+OLAP_RAW_FORMAT = "excel"
+
+# Cube Server Config (scripts/cube_server.py)
+CUBE_SERVER_HOST = "127.0.0.1"
+CUBE_SERVER_PORT = 8050
+CUBE_SERVER_WORKERS = 4  # threads answering cube queries concurrently
+CUBE_RESPONSE_CACHE_SIZE = 256  # JSON responses kept in memory (LRU)
+
+# Figure Config
+RENDER_WORKERS = None  # processes rendering figures (None = one per CPU, 1 = serial)
+
+# Extract Config
+EXTRACT_CHUNK_SIZE = 50000  # rows fetched and written per chunk (None = read whole table)
+EXTRACT_WORKERS = 6  # tables extracted concurrently
+EXTRACT_POOL_SIZE = 3  # max open connections per source database
+EXTRACT_RETRIES = 2  # extra attempts per table after a failure
+EXTRACT_RETRY_DELAY = 2.0  # seconds, doubled after each failed attempt
+
+# Load Config
+LOAD_BATCH_SIZE = 10000  # rows per executemany chunk (one commit per chunk)
+
+# Pipeline DAG Config
+DAG_STATE_PATH = os.path.join(DATA_DIR, "dag_state.json")  # input hashes of the last successful run per stage
+DAG_LOG_DIR = os.path.join(DATA_DIR, "logs")  # one output log per stage run
+DAG_WORKERS = 3  # independent stages run concurrently
+
+# Metrics Config
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+METRICS_LOG_PATH = os.path.join(METRICS_DIR, "pipeline_metrics.jsonl")  # one JSON line per stage
+METRICS_PROM_PATH = None  # e.g. a node_exporter textfile collector path ending in .prom
+PROFILE_STAGES = [s for s in os.environ.get("NORTHWIND_PROFILE", "").split(",") if s]  # stages to profile ("*" = all)
+PROFILER = "cprofile"  # "cprofile" or "pyinstrument" (if installed)
+PROFILE_DIR = os.path.join(METRICS_DIR, "profiles")
+
+# Benchmark Config
+BENCHMARK_HISTORY_PATH = os.path.join(BASE_DIR, "benchmarks", "pipeline_history.json")
+BENCHMARK_REGRESSION_THRESHOLD = 0.20  # flag stages >20% slower or larger than the previous run
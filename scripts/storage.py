@@ -0,0 +1,146 @@
+# storage.py
+"""Table storage for the extracted and warehouse layers.
+
+Parquet (typed columns, dictionary-encoded strings, compression, optional
+year/month partitioning) is the default hand-off format between stages; CSV
+stays available for export and is still read when no Parquet copy exists.
+"""
+import os
+import shutil
+import pandas as pd
+from settings import STORAGE_FORMAT, PARQUET_COMPRESSION
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXTENSIONS = {"parquet": ".parquet", "csv": ".csv"}
+
+def resolve_format(fmt=None):
+    """Returns the format to write with, falling back to CSV without pyarrow."""
+    fmt = fmt or STORAGE_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Unknown storage format: {fmt}")
+    if fmt == "parquet" and pa is None:
+        print("[WARN] pyarrow not installed, falling back to CSV storage.")
+        return "csv"
+    return fmt
+
+def table_path(directory, name, fmt=None):
+    return os.path.join(directory, name + EXTENSIONS[resolve_format(fmt)])
+
+def find_table(directory, name, fmt=None):
+    """Returns (path, format) of the stored table, preferring `fmt`, else None."""
+    preferred = resolve_format(fmt)
+    for candidate in [preferred] + [f for f in EXTENSIONS if f != preferred]:
+        path = os.path.join(directory, name + EXTENSIONS[candidate])
+        if os.path.exists(path) and (candidate != "parquet" or pa is not None):
+            return path, candidate
+    return None
+
+def replace_path(tmp_path, path):
+    """Moves a finished file or partitioned directory into place."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path) and os.path.isdir(tmp_path):
+        os.remove(path)
+    os.replace(tmp_path, path)
+
+def write_table(df, directory, name, fmt=None, partition_cols=None):
+    """Writes a DataFrame as `directory/name.<ext>` and returns the path."""
+    fmt = resolve_format(fmt)
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, name, fmt)
+    tmp_path = path + ".part"
+    if fmt == "parquet":
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+        df.to_parquet(tmp_path, engine="pyarrow", index=False, compression=PARQUET_COMPRESSION,
+                      partition_cols=partition_cols, use_dictionary=True)
+    else:
+        df.to_csv(tmp_path, index=False)
+    replace_path(tmp_path, path)
+    return path
+
+def read_table(directory, name, fmt=None, columns=None):
+    """Reads a stored table (Parquet file or partitioned directory, or CSV)."""
+    found = find_table(directory, name, fmt)
+    if found is None:
+        raise FileNotFoundError(f"No stored table '{name}' in {directory}")
+    path, fmt = found
+    if fmt == "parquet":
+        return pd.read_parquet(path, engine="pyarrow", columns=columns)
+    return pd.read_csv(path, usecols=columns)
+
+def export_csv(directory, name, output_path=None):
+    """Exports a stored table to CSV (for tools that need a flat file)."""
+    output_path = output_path or table_path(directory, name, "csv")
+    read_table(directory, name).to_csv(output_path, index=False)
+    return output_path
+
+class TableWriter:
+    """Appends DataFrame chunks to one table file; moved into place on close().
+
+    Parquet chunks are cast to the schema of the first chunk so row groups stay
+    consistent (e.g. an int column that gains NULLs in a later chunk).
+    """
+
+    def __init__(self, directory, name, fmt=None):
+        self.fmt = resolve_format(fmt)
+        os.makedirs(directory, exist_ok=True)
+        self.path = table_path(directory, name, self.fmt)
+        self.tmp_path = self.path + ".part"
+        self.rows = 0
+        self._writer = None
+        self._file = None
+        self._schema = None
+
+    def write(self, chunk):
+        if self.fmt == "parquet":
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._writer is None:
+                # All-NULL columns in the first chunk have no type yet; store them as strings
+                self._schema = pa.schema([
+                    f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema
+                ]).remove_metadata()
+                self._writer = pq.ParquetWriter(self.tmp_path, self._schema,
+                                                compression=PARQUET_COMPRESSION, use_dictionary=True)
+            self._writer.write_table(table.cast(self._schema))
+        else:
+            if self._file is None:
+                self._file = open(self.tmp_path, "w", newline="", encoding="utf-8")
+            chunk.to_csv(self._file, index=False, header=(self.rows == 0))
+        self.rows += len(chunk)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if self._writer is None and self._file is None:
+            # No chunks at all: still leave an (empty) table behind
+            if self.fmt == "parquet":
+                pq.write_table(pa.table({}), self.tmp_path)
+            else:
+                open(self.tmp_path, "w").close()
+        replace_path(self.tmp_path, self.path)
+        return self.path
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
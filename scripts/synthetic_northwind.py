@@ -0,0 +1,198 @@
+# synthetic_northwind.py
+"""Synthetic Northwind source data at configurable scale.
+
+Generates the Access tables the pipeline reads (Customers, Employees, Orders,
+Order Details, Products) with Access column names and realistic skew: a few
+customers, employees and products account for most orders (Zipf-like
+popularity), order volume grows over time, and recent orders are more often
+still unshipped. Orders and Order Details are produced in batches so 100M
+order sources can be written without holding them in memory:
+
+    python scripts/synthetic_northwind.py 1000000 data/synthetic.db [--csv DIR]
+"""
+import argparse
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+
+COUNTRIES = ["USA", "Germany", "France", "UK", "Brazil", "Canada", "Spain", "Mexico", "Italy", "Sweden"]
+COUNTRY_WEIGHTS = [0.30, 0.16, 0.12, 0.10, 0.08, 0.07, 0.06, 0.05, 0.04, 0.02]
+CITIES = {
+    "USA": ["Seattle", "Boston", "Chicago", "Las Vegas", "Portland"],
+    "Germany": ["Berlin", "Munich", "Hamburg"],
+    "France": ["Paris", "Lyon", "Marseille"],
+    "UK": ["London", "Manchester"],
+    "Brazil": ["Sao Paulo", "Rio de Janeiro"],
+    "Canada": ["Vancouver", "Montreal"],
+    "Spain": ["Madrid", "Barcelona"],
+    "Mexico": ["Mexico City"],
+    "Italy": ["Rome", "Milan"],
+    "Sweden": ["Stockholm"],
+}
+CATEGORIES = ["Beverages", "Condiments", "Dairy Products", "Grains/Cereals", "Confections", "Canned Meat", "Produce"]
+FIRST_NAMES = ["Anna", "Nancy", "Andrew", "Jan", "Mariya", "Steven", "Michael", "Robert", "Laura", "Karen", "Elizabeth", "John"]
+LAST_NAMES = ["Bedecs", "Freehafer", "Cencini", "Kotas", "Sergienko", "Thorpe", "Neipper", "Zare", "Giussani", "Toh", "Hellung", "Smith"]
+
+def scale_for(n_orders):
+    """Dimension sizes that grow with the order count (Northwind-like ratios)."""
+    return {
+        "customers": int(np.clip(n_orders // 50, 30, 2_000_000)),
+        "employees": int(np.clip(n_orders // 200_000, 9, 500)),
+        "products": int(np.clip(n_orders // 20_000, 45, 10_000)),
+    }
+
+def zipf_cdf(n, skew):
+    """Cumulative popularity of ranks 1..n with weight 1/rank^skew (skew 0 = uniform)."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return np.cumsum(weights) / weights.sum()
+
+def draw(cdf, rng, size):
+    """Draws 1-based ids from a popularity CDF (inverse transform, O(log n) per draw)."""
+    return np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1) + 1
+
+def people(n, rng, company):
+    ids = np.arange(1, n + 1)
+    countries = rng.choice(COUNTRIES, n, p=COUNTRY_WEIGHTS)
+    return pd.DataFrame({
+        "ID": ids,
+        "Company": company(ids),
+        "Last Name": rng.choice(LAST_NAMES, n),
+        "First Name": rng.choice(FIRST_NAMES, n),
+        "Job Title": rng.choice(["Owner", "Purchasing Manager", "Accounting Manager", "Sales Representative"], n),
+        "City": [rng.choice(CITIES[c]) for c in countries],
+        "Country/Region": countries,
+    })
+
+def make_customers(n, rng):
+    return people(n, rng, lambda ids: [f"Company {i}" for i in ids])
+
+def make_employees(n, rng):
+    employees = people(n, rng, lambda ids: "Northwind Traders")
+    employees["First Name"] = [f"{first}{i}" for first, i in zip(employees["First Name"], employees["ID"])]
+    return employees
+
+def make_products(n, rng):
+    ids = np.arange(1, n + 1)
+    cost = rng.lognormal(2.5, 0.8, n).round(2)
+    return pd.DataFrame({
+        "ID": ids,
+        "Product Code": [f"NWTB-{i}" for i in ids],
+        "Product Name": [f"Northwind Traders Product {i}" for i in ids],
+        "Standard Cost": cost,
+        "List Price": (cost * rng.uniform(1.1, 1.6, n)).round(2),
+        "Category": rng.choice(CATEGORIES, n),
+        "Discontinued": rng.random(n) < 0.05,
+    })
+
+def make_orders(first_id, n, n_orders, sizes, cdfs, rng, start, years, orphan_rate):
+    """One batch of Orders; dates increase with Order ID and volume grows over time."""
+    ids = np.arange(first_id, first_id + n)
+    # sqrt of the id fraction puts more orders into later periods
+    offset_days = np.sqrt((ids - 1) / max(n_orders, 1)) * 365.25 * years + rng.normal(0, 2, n)
+    order_dates = start + pd.to_timedelta(np.clip(offset_days, 0, None).astype(int), unit="D")
+    lag = pd.to_timedelta(1 + rng.geometric(0.3, n), unit="D")
+    # Recent orders are more likely to still be open
+    open_prob = np.where(ids > n_orders * 0.98, 0.3, 0.03)
+    shipped = pd.Series(order_dates + lag).where(rng.random(n) >= open_prob)
+
+    customers = draw(cdfs["customers"], rng, n)
+    orphans = rng.random(n) < orphan_rate
+    customers[orphans] = sizes["customers"] + 1  # keys missing from Customers (dropped by the ETL)
+    return pd.DataFrame({
+        "Order ID": ids,
+        "Employee ID": draw(cdfs["employees"], rng, n),
+        "Customer ID": customers,
+        "Order Date": order_dates,
+        "Shipped Date": shipped,
+        "Shipper ID": rng.integers(1, 4, n),
+        "Shipping Fee": rng.choice([0.0, 5.0, 10.0, 50.0, 200.0], n),
+        "Status ID": np.where(shipped.isna(), 0, 3),
+    })
+
+def make_order_details(orders, first_id, products, cdf, rng):
+    """Order lines for a batch of orders (geometric, ~2 per order; popular products more often)."""
+    lines = rng.geometric(0.45, len(orders))
+    order_ids = np.repeat(orders["Order ID"].to_numpy(), lines)
+    n = len(order_ids)
+    product_ids = draw(cdf, rng, n)
+    return pd.DataFrame({
+        "ID": np.arange(first_id, first_id + n),
+        "Order ID": order_ids,
+        "Product ID": product_ids,
+        "Quantity": rng.geometric(0.05, n).astype(float),
+        "Unit Price": products["List Price"].to_numpy()[product_ids - 1],
+        "Discount": rng.choice([0.0, 0.0, 0.0, 0.05, 0.1, 0.15], n),
+        "Status ID": 2,
+    })
+
+def iter_sources(n_orders, seed=42, skew=1.1, batch_size=500_000, years=5, start="2006-01-01", orphan_rate=0.0):
+    """Yields (table, frame) batches of a Northwind-shaped source with `n_orders` orders."""
+    rng = np.random.default_rng(seed)
+    sizes = scale_for(n_orders)
+    cdfs = {
+        "customers": zipf_cdf(sizes["customers"], skew),
+        "employees": zipf_cdf(sizes["employees"], skew / 2),
+        "products": zipf_cdf(sizes["products"], skew),
+    }
+    products = make_products(sizes["products"], rng)
+    yield "Customers", make_customers(sizes["customers"], rng)
+    yield "Employees", make_employees(sizes["employees"], rng)
+    yield "Products", products
+
+    start, next_line = pd.Timestamp(start), 1
+    for first_id in range(1, n_orders + 1, batch_size):
+        orders = make_orders(first_id, min(batch_size, n_orders - first_id + 1), n_orders, sizes, cdfs,
+                             rng, start, years, orphan_rate)
+        details = make_order_details(orders, next_line, products, cdfs["products"], rng)
+        next_line += len(details)
+        yield "Orders", orders
+        yield "Order Details", details
+
+def write_sqlite(path, n_orders, **options):
+    """Writes the source tables into a SQLite file (Access stand-in); returns row counts."""
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    counts = {}
+    try:
+        for table, frame in iter_sources(n_orders, **options):
+            frame.to_sql(table, conn, if_exists="append" if table in counts else "replace", index=False)
+            counts[table] = counts.get(table, 0) + len(frame)
+        # Access keys are indexed; the incremental ETL filters on them
+        for table, key in [("Customers", "ID"), ("Employees", "ID"), ("Products", "ID"),
+                           ("Orders", "Order ID"), ("Order Details", "ID")]:
+            conn.execute(f'CREATE UNIQUE INDEX "ix_{table.replace(" ", "_")}" ON [{table}] ([{key}])')
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+def write_csv(directory, n_orders, **options):
+    """Writes the source tables as Access_<Table>.csv files (extracted-layer naming)."""
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for table, frame in iter_sources(n_orders, **options):
+        path = os.path.join(directory, f"Access_{table.replace(' ', '_')}.csv")
+        frame.to_csv(path, mode="a" if table in counts else "w", header=table not in counts, index=False)
+        counts[table] = counts.get(table, 0) + len(frame)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Northwind source")
+    parser.add_argument("n_orders", type=int)
+    parser.add_argument("path", help="SQLite file to write")
+    parser.add_argument("--csv", metavar="DIR", help="also write the tables as CSV files into DIR")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of customer/product popularity (0 = uniform)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    options = {"seed": args.seed, "skew": args.skew}
+    counts = write_sqlite(args.path, args.n_orders, **options)
+    print(f"Wrote {args.path}: " + ", ".join(f"{t} {n}" for t, n in counts.items()))
+    if args.csv:
+        write_csv(args.csv, args.n_orders, **options)
+        print(f"Wrote CSV copies to {args.csv}")
+
+if __name__ == "__main__":
+    main()
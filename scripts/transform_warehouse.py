@@ -1,22 +1,25 @@
 import pandas as pd
 import os
-from settings import DATA_DIR
+from settings import EXTRACTED_DIR, WAREHOUSE_DIR, WAREHOUSE_PARTITION_COLS, EXPORT_CSV
+from storage import read_table, write_table, export_csv
+from dtype_plan import apply_dtype_plan
+import metrics
 
-def transform_and_load_warehouse():
-    """Reads extracted CSVs, merges them, and saves to warehouse."""
+def transform_and_load_warehouse(fmt=None):
+    """Reads the extracted layer, merges it, and saves to warehouse."""
     print("--- Starting Transformation and Loading to Warehouse ---")
     
-    extracted_dir = os.path.join(DATA_DIR, "extracted")
-    warehouse_dir = os.path.join(DATA_DIR, "warehouse")
+    extracted_dir = EXTRACTED_DIR
+    warehouse_dir = WAREHOUSE_DIR
     os.makedirs(warehouse_dir, exist_ok=True)
     
     try:
-        # Load extracted data
-        print("Loading extracted CSVs...")
-        dim_customer = pd.read_csv(os.path.join(extracted_dir, "DimCustomer.csv"))
-        dim_employee = pd.read_csv(os.path.join(extracted_dir, "DimEmployee.csv"))
-        dim_date = pd.read_csv(os.path.join(extracted_dir, "DimDate.csv"))
-        fact_orders = pd.read_csv(os.path.join(extracted_dir, "FactOrders.csv"))
+        # Load extracted data (compact dtypes: categoricals, downcast integers, boolean flags)
+        print("Loading extracted tables...")
+        dim_customer = apply_dtype_plan(read_table(extracted_dir, "DimCustomer"), "DimCustomer")
+        dim_employee = apply_dtype_plan(read_table(extracted_dir, "DimEmployee"), "DimEmployee")
+        dim_date = apply_dtype_plan(read_table(extracted_dir, "DimDate"), "DimDate")
+        fact_orders = apply_dtype_plan(read_table(extracted_dir, "FactOrders"), "FactOrders")
         
         # Merge Data
         # FactOrders -> DimCustomer
@@ -32,18 +35,23 @@ def transform_and_load_warehouse():
         merged = merged.merge(dim_date, on="DateId", how="left")
         
         # Save to Warehouse
-        output_path = os.path.join(warehouse_dir, "merged_northwind.csv")
-        merged.to_csv(output_path, index=False)
+        # Year/Month partition columns come with DimDate
+        partition_cols = WAREHOUSE_PARTITION_COLS
+        output_path = write_table(merged, warehouse_dir, "merged_northwind", fmt, partition_cols)
         print(f"Warehouse data saved to {output_path}")
+        if EXPORT_CSV:
+            print(f"CSV export saved to {export_csv(warehouse_dir, 'merged_northwind')}")
         print(f"Total records in warehouse: {len(merged)}")
+        metrics.add_rows(len(merged))
         print("--- Warehouse Load Complete ---")
         
     except FileNotFoundError as e:
-        print(f"[ERROR] Could not find extracted files. Run extract_sql.py first. Details: {e}")
+        print(f"[ERROR] Could not find extracted tables. Run extract_sql.py first. Details: {e}")
         raise
     except Exception as e:
         print(f"[ERROR] Transformation failed: {e}")
         raise
 
 if __name__ == "__main__":
-    transform_and_load_warehouse()
+    with metrics.stage("transform_warehouse"):
+        transform_and_load_warehouse()
@@ -0,0 +1,331 @@
+# warehouse_backend.py
+"""Warehouse database backends: SQL Server, or an embedded DuckDB / SQLite file.
+
+All backends hold the same star schema (DDL types are translated from the
+SQL Server definitions) and speak the qmark paramstyle, so the loaders and
+queries are shared. What differs lives here: connecting, schema creation,
+temporary tables, the set-based upsert (MERGE vs INSERT ... ON CONFLICT),
+index layout, swapping in reloads and reading results.
+Select one with WAREHOUSE_BACKEND in settings.py; "duckdb" falls back to
+SQLite when the duckdb package is not installed. pyodbc (and unixODBC) is
+only imported by the SQL Server backend, when it connects.
+"""
+import os
+import re
+import sqlite3
+import pandas as pd
+from metrics import unwrap, count_round_trip
+from settings import SQL_SERVER, SQL_DATABASE, SQL_DRIVER, WAREHOUSE_BACKEND, WAREHOUSE_DB_PATH
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+def get_sql_conn_str(db="master"):
+    return f"DRIVER={{{SQL_DRIVER}}};SERVER={SQL_SERVER};DATABASE={db};Trusted_Connection=yes;"
+
+class SqlServerBackend:
+    """The original SQL Server warehouse over ODBC."""
+
+    name = "sqlserver"
+    swaps_tables = True  # staging tables are renamed in, so they need the live indexes
+
+    def connect(self, autocommit=False, read_only=False):
+        import pyodbc
+        return pyodbc.connect(get_sql_conn_str(SQL_DATABASE), autocommit=autocommit)
+
+    def translate_ddl(self, ddl):
+        return ddl
+
+    def ensure_database(self):
+        """Creates the warehouse database if missing."""
+        print("--- Setting up SQL Server ---")
+        try:
+            import pyodbc
+            conn = pyodbc.connect(get_sql_conn_str("master"), autocommit=True)
+            cur = conn.cursor()
+            cur.execute("SELECT name FROM sys.databases WHERE name = ?", SQL_DATABASE)
+            if not cur.fetchone():
+                print(f"Creating Database: {SQL_DATABASE}")
+                cur.execute(f"CREATE DATABASE {SQL_DATABASE}")
+            else:
+                print(f"Database {SQL_DATABASE} exists.")
+            conn.close()
+        except Exception as e:
+            print(f"[ERROR] Master DB connection failed: {e}")
+            raise
+
+    def create_table_sql(self, table, ddl):
+        return f"IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table}' AND xtype='U') CREATE TABLE {table} ({ddl})"
+
+    def copy_table_sql(self, source, target):
+        return f"SELECT * INTO {target} FROM {source}"
+
+    def table_exists(self, conn, table):
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM sys.tables WHERE name = ?", table)
+        exists = cur.fetchone()[0] > 0
+        cur.close()
+        return exists
+
+    def ensure_indexes(self, conn, indexes, clustered, columnstore=False):
+        """Creates missing nonclustered indexes and the clustered index.
+
+        The clustered index is a rowstore index on its column, or a clustered
+        columnstore index with `columnstore`; switching rebuilds it in place.
+        """
+        cur = conn.cursor()
+        for name, (table, column) in indexes.items():
+            cur.execute(f"IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}')) "
+                        f"CREATE NONCLUSTERED INDEX {name} ON {table} ({column})")
+        name, table, column = clustered
+        wanted = "CLUSTERED COLUMNSTORE" if columnstore else "CLUSTERED"
+        cur.execute("SELECT type_desc FROM sys.indexes WHERE name = ? AND object_id = OBJECT_ID(?)", name, table)
+        row = cur.fetchone()
+        if row is None or row[0] != wanted:
+            print(f"Building {wanted.lower()} index {name} on {table}...")
+            if columnstore:
+                create = f"CREATE CLUSTERED COLUMNSTORE INDEX {name} ON {table}"
+            else:
+                create = f"CREATE CLUSTERED INDEX {name} ON {table} ({column})"
+            cur.execute(create + (" WITH (DROP_EXISTING = ON)" if row is not None else ""))
+        cur.close()
+
+    def create_temp_table(self, conn, name, ddl):
+        """Session-scoped #temp table; returns the name to query it by."""
+        conn.execute(f"CREATE TABLE #{name} ({ddl})")
+        return f"#{name}"
+
+    def merge_sql(self, table, source, columns, key):
+        """One MERGE of a SELECT into `table` (update if the key exists, insert otherwise)."""
+        updates = ", ".join(f"t.{c} = s.{c}" for c in columns if c != key)
+        return (
+            f"MERGE INTO {table} WITH (HOLDLOCK) AS t "
+            f"USING ({source}) AS s "
+            f"ON t.{key} = s.{key} "
+            f"WHEN MATCHED THEN UPDATE SET {updates} "
+            f"WHEN NOT MATCHED THEN INSERT ({', '.join(columns)}) VALUES ({', '.join('s.' + c for c in columns)});"
+        )
+
+    def drop_foreign_keys(self, cur, tables):
+        """Drops every FK from or to `tables` (looked up by name: inline FKs are system-named)."""
+        ids = ", ".join(f"OBJECT_ID('{table}')" for table in tables)
+        cur.execute(f"SELECT OBJECT_NAME(parent_object_id), name FROM sys.foreign_keys "
+                    f"WHERE parent_object_id IN ({ids}) OR referenced_object_id IN ({ids})")
+        for table, name in cur.fetchall():
+            cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+
+    def add_foreign_keys(self, cur, foreign_keys):
+        # WITH CHECK validates the existing rows, so the optimizer can trust the constraints
+        for table, column, ref_table, ref_column in foreign_keys:
+            cur.execute(f"ALTER TABLE {table} WITH CHECK ADD CONSTRAINT FK_{table}_{column} "
+                        f"FOREIGN KEY ({column}) REFERENCES {ref_table} ({ref_column})")
+
+    def swap_tables(self, conn, tables, suffix, foreign_keys, keys):
+        """Renames the staging tables over the live ones in one transaction.
+
+        Readers block on the schema locks for the duration of the renames and
+        then see the new load; until the commit they see the previous one.
+        """
+        cur = conn.cursor()
+        try:
+            self.drop_foreign_keys(cur, tables)
+            for table in tables:
+                cur.execute("EXEC sp_rename ?, ?", table, f"{table}_Old")
+                cur.execute("EXEC sp_rename ?, ?", table + suffix, table)
+            self.add_foreign_keys(cur, foreign_keys)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    def finish_swap(self, conn, tables, suffix, keys):
+        """Drops the replaced tables."""
+        cur = conn.cursor()
+        for table in tables:
+            cur.execute(f"DROP TABLE IF EXISTS {table}_Old")
+        conn.commit()
+        cur.close()
+
+    def read_sql(self, sql, conn, params=None):
+        return pd.read_sql(sql, conn, params=params)
+
+    def warehouse_id(self, conn):
+        """Server, database and its creation time: a re-created database is another warehouse."""
+        cur = conn.cursor()
+        cur.execute("SELECT CONVERT(VARCHAR(23), create_date, 126) FROM sys.databases WHERE name = DB_NAME()")
+        created = cur.fetchone()[0]
+        cur.close()
+        return f"{self.name}:{SQL_SERVER}/{SQL_DATABASE}@{created}"
+
+class EmbeddedBackend:
+    """Shared parts of the file-based backends (SQL Server DDL translated, ON CONFLICT upserts)."""
+
+    # SQL Server type / keyword -> embedded equivalent
+    TYPE_MAP = [(r"\bNVARCHAR\s*\(\s*\w+\s*\)", "VARCHAR"), (r"\bDATETIME2?\b", "TIMESTAMP"), (r"\bBIT\b", "BOOLEAN"),
+                (r"\bFLOAT\b", "DOUBLE"),
+                (r"\s+(NON)?CLUSTERED\b", "")]
+
+    swaps_tables = False  # rows are copied from staging (DuckDB cannot rename tables that have FKs)
+
+    def __init__(self, path):
+        self.path = path
+
+    def warehouse_id(self, conn):
+        """Database file and its inode: a re-created file is another warehouse."""
+        path = os.path.abspath(self.path)
+        inode = os.stat(path).st_ino if os.path.exists(path) else 0
+        return f"{self.name}:{path}@{inode}"
+
+    def translate_ddl(self, ddl):
+        for pattern, replacement in self.TYPE_MAP:
+            ddl = re.sub(pattern, replacement, ddl, flags=re.IGNORECASE)
+        return ddl
+
+    def ensure_database(self):
+        print(f"--- Setting up {self.name} warehouse ({self.path}) ---")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def create_table_sql(self, table, ddl):
+        return f"CREATE TABLE IF NOT EXISTS {table} ({self.translate_ddl(ddl)})"
+
+    def copy_table_sql(self, source, target):
+        return f"CREATE TABLE {target} AS SELECT * FROM {source}"
+
+    def ensure_indexes(self, conn, indexes, clustered, columnstore=False):
+        """Plain indexes only: the clustered column gets a secondary index like the others."""
+        indexes = dict(indexes, **{clustered[0]: clustered[1:]})
+        cur = conn.cursor()
+        for name, (table, column) in indexes.items():
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column})")
+        cur.close()
+
+    def swap_tables(self, conn, tables, suffix, foreign_keys, keys):
+        """Replaces the live rows with the staging rows in one transaction.
+
+        Referenced (dimension) tables are upserted rather than emptied: DuckDB
+        rejects deleting a referenced key even after the referencing rows were
+        deleted in the same transaction. finish_swap prunes their stale rows.
+        Statements run on the connection itself (DuckDB cursors are separate
+        connections with their own transactions).
+        """
+        referenced = {fk[2] for fk in foreign_keys}
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            for table in reversed(tables):
+                if table not in referenced:
+                    conn.execute(f"DELETE FROM {table}")
+            for table in tables:
+                verb = "INSERT OR REPLACE" if table in referenced else "INSERT"
+                conn.execute(f"{verb} INTO {table} SELECT * FROM {table}{suffix}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def finish_swap(self, conn, tables, suffix, keys):
+        """Removes dimension rows that are not in the new load, then the staging tables."""
+        for table in reversed(tables):
+            key = keys[table]
+            conn.execute(f"DELETE FROM {table} WHERE {key} NOT IN (SELECT {key} FROM {table}{suffix})")
+            conn.execute(f"DROP TABLE {table}{suffix}")
+        conn.commit()
+
+    def create_temp_table(self, conn, name, ddl):
+        # On the connection itself: temp tables are per connection (and DuckDB cursors are connections)
+        conn.execute(f"CREATE TEMP TABLE {name} ({self.translate_ddl(ddl)})")
+        return name
+
+    def merge_sql(self, table, source, columns, key):
+        """INSERT ... SELECT with ON CONFLICT DO UPDATE (the WHERE lets SQLite parse the upsert)."""
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != key)
+        return (f"INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM ({source}) s WHERE true "
+                f"ON CONFLICT ({key}) DO UPDATE SET {updates}")
+
+class DuckDBBackend(EmbeddedBackend):
+    """Embedded columnar warehouse (one .duckdb file); analytical joins run vectorized."""
+
+    name = "duckdb"
+
+    def connect(self, autocommit=False, read_only=False):
+        # Several processes may read at once, but only one may hold the file for writing
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if read_only and os.path.exists(self.path):
+            try:
+                return duckdb.connect(self.path, read_only=True)
+            except duckdb.ConnectionException:
+                pass  # this process already has the file open for writing; share that
+        return duckdb.connect(self.path)
+
+    def table_exists(self, conn, table):
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [table])
+        exists = cur.fetchone()[0] > 0
+        cur.close()
+        return exists
+
+    def ensure_indexes(self, conn, indexes, clustered, columnstore=False):
+        # Storage is already columnar with per-block min/max, and joins are hash joins;
+        # ART indexes would only slow the loads (and block updates of indexed columns)
+        pass
+
+    def read_sql(self, sql, conn, params=None):
+        """Fetches the result as columns (no per-row Python tuples)."""
+        return conn.cursor().execute(sql, list(params or [])).df()
+
+class SQLiteBackend(EmbeddedBackend):
+    """Embedded row-store fallback (standard library only)."""
+
+    name = "sqlite"
+
+    def connect(self, autocommit=False, read_only=False):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if read_only and os.path.exists(self.path):
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def table_exists(self, conn, table):
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", [table])
+        exists = cur.fetchone()[0] > 0
+        cur.close()
+        return exists
+
+    def read_sql(self, sql, conn, params=None):
+        # pandas only recognises the raw sqlite3 connection
+        count_round_trip()
+        return pd.read_sql(sql, unwrap(conn), params=params)
+
+_backends = {}
+
+def get_backend(name=None):
+    """The configured warehouse backend (one shared instance per name)."""
+    name = (name or WAREHOUSE_BACKEND).lower()
+    if name not in _backends:
+        if name == "sqlserver":
+            _backends[name] = SqlServerBackend()
+        elif name == "duckdb" and duckdb is not None:
+            _backends[name] = DuckDBBackend(WAREHOUSE_DB_PATH + ".duckdb")
+        elif name == "duckdb":
+            print("[WARN] duckdb not installed, falling back to the SQLite warehouse.")
+            _backends[name] = get_backend("sqlite")
+        elif name == "sqlite":
+            _backends[name] = SQLiteBackend(WAREHOUSE_DB_PATH + ".sqlite")
+        else:
+            raise ValueError(f"Unknown warehouse backend: {name}")
+    return _backends[name]
+
+def backend_of(conn):
+    """The backend a (possibly metrics-wrapped) connection belongs to."""
+    module = type(unwrap(conn)).__module__
+    if module.startswith(("duckdb", "_duckdb")):
+        return get_backend("duckdb")
+    if module.startswith("sqlite3"):
+        return get_backend("sqlite")
+    return get_backend("sqlserver")
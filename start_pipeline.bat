@@ -1,7 +1,8 @@
 @echo off
 REM Script pour lancer le pipeline avec le bon interpréteur Python
 echo Lancement du pipeline BI...
-"C:\Users\HP\AppData\Local\Microsoft\WindowsApps\python.exe" scripts/main.py
+REM Les etapes inchangees sont sautees (options: --from <etape>, --force, --incremental)
+"C:\Users\HP\AppData\Local\Microsoft\WindowsApps\python.exe" scripts/run_pipeline.py %*
 if %ERRORLEVEL% NEQ 0 (
     echo.
     echo Une erreur est survenue wess.